@@ -0,0 +1,171 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+from effects_processor import EffectsProcessor
+from effect_registry import EFFECTS
+
+# Resoluções de teste (largura, altura)
+RESOLUTIONS = {
+    "360p": (640, 360),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+
+def write_identity_cube(path, size=17):
+    """Grava uma LUT .cube identidade, usada para medir o efeito "lut" sem arquivo externo"""
+    levels = np.linspace(0, 1, size)
+    with open(path, "w") as f:
+        f.write(f'TITLE "identidade"\nLUT_3D_SIZE {size}\n')
+        for b in levels:
+            for g in levels:
+                for r in levels:
+                    f.write(f"{r:.6f} {g:.6f} {b:.6f}\n")
+
+
+def benchmark_effect(processor, effect, frames, output_format, warmup):
+    """Mede um efeito sobre os frames sintéticos: latências (s) e bytes alocados por frame"""
+    out = np.empty_like(frames[0])
+
+    # Aquecimento: compila a cadeia e preenche o cache de LUTs e máscaras
+    for i in range(warmup):
+        processor.apply_effect_to_frame(frames[i % len(frames)], effect, out=out,
+                                        output_format=output_format)
+
+    latencies = []
+    for frame in frames:
+        start = time.perf_counter()
+        processor.apply_effect_to_frame(frame, effect, out=out, output_format=output_format)
+        latencies.append(time.perf_counter() - start)
+
+    # Alocações medidas em uma passada separada (o tracemalloc deixa as chamadas mais lentas)
+    tracemalloc.start()
+    sample = frames[:min(5, len(frames))]
+    for frame in sample:
+        processor.apply_effect_to_frame(frame, effect, out=out, output_format=output_format)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return np.array(latencies), peak
+
+
+def run_suite(effects, resolutions, frame_count, warmup, tiles, output_format):
+    """Executa todos os efeitos em todas as resoluções e retorna os resultados por caso"""
+    processor = EffectsProcessor(tiles=tiles)
+    rng = np.random.default_rng(0)
+    results = {}
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        # Poucos frames distintos bastam; o custo dos efeitos não depende do conteúdo
+        frames = rng.integers(0, 256, (min(frame_count, 4), height, width, 3), dtype=np.uint8)
+        frames = [frames[i % len(frames)] for i in range(frame_count)]
+        for effect in effects:
+            latencies, peak = benchmark_effect(processor, effect, frames, output_format, warmup)
+            total = latencies.sum()
+            results[f"{effect_name(effect)}@{resolution}"] = {
+                "p50_ms": float(np.percentile(latencies, 50) * 1000),
+                "p90_ms": float(np.percentile(latencies, 90) * 1000),
+                "p99_ms": float(np.percentile(latencies, 99) * 1000),
+                "fps": frame_count / total,
+                "mpixels_s": frame_count * width * height / total / 1e6,
+                "alloc_kb": peak / 1024,
+            }
+    processor.shutdown()
+    return results
+
+
+def effect_name(effect):
+    """Nome estável do efeito para o relatório e o baseline (sem caminhos temporários)"""
+    return "lut" if effect.startswith("lut:") else effect
+
+
+def print_results(results, baseline=None):
+    """Imprime a tabela de resultados, com a variação da mediana em relação ao baseline"""
+    width = max([28] + [len(case) + 2 for case in results])
+    header = f"{'efeito@resolução':<{width}}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'fps':>9}{'Mpx/s':>9}{'aloc KB':>10}"
+    if baseline is not None:
+        header += f"{'vs base':>10}"
+    print(header)
+    for case, r in results.items():
+        line = (f"{case:<{width}}{r['p50_ms']:>9.2f}{r['p90_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+                f"{r['fps']:>9.1f}{r['mpixels_s']:>9.1f}{r['alloc_kb']:>10.1f}")
+        if baseline is not None and case in baseline:
+            line += f"{r['p50_ms'] / baseline[case]['p50_ms'] - 1:>+10.1%}"
+        print(line)
+
+
+def find_regressions(results, baseline, threshold):
+    """Retorna os casos cuja mediana ficou mais de `threshold` (fração) acima do baseline"""
+    regressions = []
+    for case, r in results.items():
+        base = baseline.get(case)
+        if base is not None and r["p50_ms"] > base["p50_ms"] * (1 + threshold):
+            regressions.append((case, base["p50_ms"], r["p50_ms"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dos efeitos visuais (sem interface gráfica)")
+    parser.add_argument("--effects", default=",".join(EFFECTS),
+                        help="Efeitos ou cadeias separados por vírgula (padrão: todos os registrados)")
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS),
+                        help="Resoluções separadas por vírgula (padrão: 360p,720p,1080p,4k)")
+    parser.add_argument("--frames", type=int, default=60, help="Frames medidos por caso (padrão: 60)")
+    parser.add_argument("--warmup", type=int, default=5, help="Frames de aquecimento por caso (padrão: 5)")
+    parser.add_argument("--tiles", type=int, default=0,
+                        help="Faixas paralelas por frame (0 = automático, 1 = desativado)")
+    parser.add_argument("--output-format", choices=("bgr", "rgb"), default="bgr",
+                        help="Formato de saída pedido aos efeitos (padrão: bgr)")
+    parser.add_argument("--save-baseline", metavar="ARQUIVO", help="Grava os resultados como baseline JSON")
+    parser.add_argument("--baseline", metavar="ARQUIVO", help="Compara com um baseline JSON gravado antes")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Piora máxima aceita da mediana em relação ao baseline (padrão: 0.25 = 25%%)")
+    args = parser.parse_args()
+
+    resolutions = [r.strip().lower() for r in args.resolutions.split(",") if r.strip()]
+    unknown = [r for r in resolutions if r not in RESOLUTIONS]
+    if unknown:
+        parser.error(f"resoluções desconhecidas: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # O efeito "lut" precisa de um arquivo .cube: usa uma LUT identidade temporária
+        cube_path = os.path.join(temp_dir, "identidade.cube")
+        write_identity_cube(cube_path)
+        effects = []
+        # Vírgulas seguidas de chave=valor separam parâmetros, não efeitos
+        for effect in (e.strip() for e in re.split(r",(?![^,:+]*=)", args.effects) if e.strip()):
+            effects.append(f'lut:path="{cube_path}"' if effect == "lut" else effect)
+
+        processor = EffectsProcessor()
+        invalid = [effect for effect in effects if not processor.is_valid_chain(effect)]
+        if invalid:
+            parser.error(f"efeitos inválidos: {', '.join(invalid)}")
+
+        results = run_suite(effects, resolutions, args.frames, args.warmup, args.tiles, args.output_format)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({"cpu_count": os.cpu_count(), "numpy": np.__version__,
+                       "output_format": args.output_format, "tiles": args.tiles,
+                       "results": results}, f, indent=2)
+        print(f"Baseline gravado em {args.save_baseline}")
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.threshold)
+        for case, before, after in regressions:
+            print(f"REGRESSÃO {case}: mediana {before:.2f} ms -> {after:.2f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"Nenhuma regressão acima de {args.threshold:.0%}")
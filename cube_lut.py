@@ -0,0 +1,87 @@
+import os
+import threading
+import numpy as np
+
+# LUTs já lidas, por caminho absoluto e data de modificação do arquivo
+_cube_cache = {}
+_cube_cache_lock = threading.Lock()
+
+
+def load_cube(path):
+    """Retorna a LUT do arquivo .cube, lendo-o só na primeira vez (ou se ele mudar)"""
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    with _cube_cache_lock:
+        lut = _cube_cache.get(key)
+        if lut is None:
+            lut = CubeLUT(path)
+            _cube_cache[key] = lut
+        return lut
+
+
+class CubeLUT:
+    def __init__(self, path):
+        """
+        LUT 3D no formato .cube (Adobe/Resolve), usada na correção de cor.
+        A tabela fica em float32 (N, N, N, 3) indexada por [b, g, r] com valores RGB,
+        na mesma ordem das linhas do arquivo (R varia mais rápido).
+        """
+        self.path = path
+        self.title = ""
+        self.size = 0
+        self.domain_min = np.zeros(3, dtype=np.float32)
+        self.domain_max = np.ones(3, dtype=np.float32)
+        self.table = None
+        self.parse()
+
+    def parse(self):
+        """Lê o cabeçalho e os valores da LUT"""
+        values = []
+        with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                keyword = line.split()[0].upper()
+                if keyword == "TITLE":
+                    self.title = line[5:].strip().strip('"')
+                elif keyword == "LUT_3D_SIZE":
+                    self.size = int(line.split()[1])
+                elif keyword == "LUT_1D_SIZE":
+                    raise ValueError("LUTs 1D (.cube com LUT_1D_SIZE) não são suportadas")
+                elif keyword == "DOMAIN_MIN":
+                    self.domain_min = np.array(line.split()[1:4], dtype=np.float32)
+                elif keyword == "DOMAIN_MAX":
+                    self.domain_max = np.array(line.split()[1:4], dtype=np.float32)
+                elif keyword[0].isdigit() or keyword[0] in "-.":
+                    values.append(line.split()[:3])
+
+        if self.size < 2:
+            raise ValueError(f"LUT_3D_SIZE ausente ou inválido em {self.path}")
+        if len(values) != self.size ** 3:
+            raise ValueError(f"Esperados {self.size ** 3} valores na LUT, encontrados {len(values)}")
+        self.table = np.array(values, dtype=np.float32).reshape(self.size, self.size, self.size, 3)
+
+    def sample(self, rgb):
+        """Interpola a LUT (trilinear, vetorizado) em pontos RGB (M, 3) do domínio"""
+        n = self.size
+        scale = (n - 1) / np.maximum(self.domain_max - self.domain_min, 1e-6)
+        position = np.clip((rgb - self.domain_min) * scale, 0, n - 1).astype(np.float32)
+
+        # Célula da grade e posição dentro dela; o último ponto usa a célula anterior
+        cell = np.minimum(position.astype(np.int32), n - 2)
+        fraction = position - cell
+        r, g, b = cell[:, 0], cell[:, 1], cell[:, 2]
+        fr, fg, fb = fraction[:, 0:1], fraction[:, 1:2], fraction[:, 2:3]
+
+        flat = self.table.reshape(-1, 3)
+        base = (b * n + g) * n + r
+        result = np.zeros((len(rgb), 3), dtype=np.float32)
+        # Soma ponderada dos 8 vértices da célula
+        for db in (0, 1):
+            wb = fb if db else 1 - fb
+            for dg in (0, 1):
+                wg = fg if dg else 1 - fg
+                for dr in (0, 1):
+                    wr = fr if dr else 1 - fr
+                    result += wb * wg * wr * flat[base + (db * n + dg) * n + dr]
+        return result
@@ -0,0 +1,213 @@
+import os
+from collections import OrderedDict
+import numpy as np
+from cube_lut import load_cube
+
+# Matrizes BGR dos efeitos de cor
+SEPIA_KERNEL = np.array([[0.272, 0.534, 0.131],
+                         [0.349, 0.686, 0.168],
+                         [0.393, 0.769, 0.189]])
+GRAY_KERNEL = np.array([[0.114, 0.587, 0.299]] * 3)  # Cinza replicado nos 3 canais
+
+# Rotação de matiz que preserva a luminância (coeficientes Rec.709, em ordem RGB)
+HUE_BASE = np.array([[0.213, 0.715, 0.072]] * 3)
+HUE_COS = np.array([[0.787, -0.715, -0.072],
+                    [-0.213, 0.285, -0.072],
+                    [-0.213, -0.715, 0.928]])
+HUE_SIN = np.array([[-0.213, -0.715, 0.928],
+                    [0.143, 0.140, -0.283],
+                    [-0.787, 0.715, 0.072]])
+
+
+class EffectDefinition:
+    def __init__(self, name, label, kind, channels=3, params=None, build_lut=None,
+                 build_matrix=None, build_sampler=None, build_mask=None, in_menu=True, controls=None,
+                 validate=None):
+        """
+        Declaração de um efeito: o EffectsProcessor escolhe o caminho de execução
+        (fusão de LUTs/matrizes, LUT 3D, máscara em cache) a partir dela, e a
+        janela de efeitos é gerada a partir do registro.
+
+        kind: "pointwise" (cada pixel depende só da própria cor) ou "spatial"
+              (depende da posição; aplicado com uma máscara)
+        channels: canais da saída quando o efeito é aplicado sozinho (1 = cinza)
+        params: parâmetros e valores padrão (o tipo do padrão define a conversão)
+        controls: parâmetros ajustáveis na interface, como nome -> (rótulo, mínimo, máximo);
+                  os valores recebidos são limitados a essa faixa
+        validate: função(params) que levanta exceção se os parâmetros não puderem ser
+                  usados (ex.: arquivo .cube malformado)
+
+        Pré-cálculos, memorizados pelo EffectsProcessor por parâmetros:
+          build_lut(params) -> LUT uint8 (256, 3), uma coluna por canal BGR
+          build_matrix(params) -> matriz afim (3, 4) aplicada às cores BGR
+          build_sampler(params) -> função de cores BGR uint8 (M, 3) para BGR uint8
+          build_mask(rows, cols, params) -> máscara float32 (rows, cols)
+        """
+        self.name = name
+        self.label = label
+        self.kind = kind
+        self.channels = channels
+        self.params = params or {}
+        self.build_lut = build_lut
+        self.build_matrix = build_matrix
+        self.build_sampler = build_sampler
+        self.build_mask = build_mask
+        self.in_menu = in_menu
+        self.controls = controls or {}
+        self.validate = validate
+
+    def resolve_params(self, params):
+        """Completa os parâmetros com os padrões, convertendo os valores recebidos como texto"""
+        resolved = dict(self.params)
+        for key, value in params.items():
+            if key in self.params:
+                resolved[key] = type(self.params[key])(value)
+            if key in self.controls:
+                _, minimum, maximum = self.controls[key]
+                resolved[key] = min(max(resolved[key], type(resolved[key])(minimum)),
+                                    type(resolved[key])(maximum))
+        return resolved
+
+    def format_params(self, params):
+        """Texto nome:chave=valor com os parâmetros que diferem do padrão"""
+        changed = [f"{key}={value:g}" if isinstance(value, float) else f"{key}={value}"
+                   for key, value in self.resolve_params(params).items()
+                   if value != self.params[key]]
+        return self.name + (":" + ",".join(changed) if changed else "")
+
+    def is_valid(self, params):
+        """Verifica se os parâmetros são aceitos (e se o arquivo indicado existe e pode ser lido)"""
+        try:
+            resolved = self.resolve_params(params)
+        except ValueError:
+            return False
+        if "path" in resolved and not os.path.isfile(resolved["path"]):
+            return False
+        if self.validate is not None:
+            try:
+                self.validate(resolved)
+            except Exception:
+                return False
+        return True
+
+
+# Efeitos disponíveis, na ordem exibida na interface
+EFFECTS = OrderedDict()
+
+
+def register_effect(definition):
+    """Adiciona (ou substitui) um efeito no registro"""
+    EFFECTS[definition.name] = definition
+    return definition
+
+
+def get_effect(name):
+    """Retorna a definição do efeito, ou None se ele não existir"""
+    return EFFECTS.get(name)
+
+
+def per_channel(lut):
+    """Replica uma LUT de 256 valores nos 3 canais"""
+    return np.repeat(lut.astype(np.uint8)[:, None], 3, axis=1)
+
+
+def affine(matrix, offset=0.0):
+    """Matriz afim (3, 4) a partir da parte linear e do deslocamento"""
+    return np.hstack([matrix, np.full((3, 1), float(offset))])
+
+
+def posterize_lut(params):
+    """Tabela de posterização com o número de níveis especificado"""
+    step = 255 / params["levels"]
+    return per_channel(np.round(np.arange(256) / step) * step)
+
+
+def compose(*matrices):
+    """Compõe matrizes afins (3, 4) aplicadas em sequência em uma única matriz"""
+    result = affine(np.eye(3))
+    for matrix in matrices:
+        result = np.hstack([matrix[:, :3] @ result[:, :3],
+                            (matrix[:, :3] @ result[:, 3] + matrix[:, 3])[:, None]])
+    return result
+
+
+def color_matrix(params):
+    """
+    Ajustes de tom compostos em uma única matriz afim: contraste (em torno do
+    cinza médio), brilho, saturação, matiz e sépia, nessa ordem.
+    """
+    contrast = params["contrast"]
+    offset = 127.5 * (1 - contrast) + 255 * params["brightness"]
+    tone = affine(contrast * np.eye(3), offset)
+
+    # Saturação: mistura com o cinza do efeito preto e branco
+    saturation = params["saturation"]
+    saturate = affine(saturation * np.eye(3) + (1 - saturation) * GRAY_KERNEL)
+
+    # Matiz: a matriz RGB vira BGR invertendo linhas e colunas
+    angle = np.radians(params["hue"])
+    hue = HUE_BASE + np.cos(angle) * HUE_COS + np.sin(angle) * HUE_SIN
+    rotate = affine(hue[::-1, ::-1])
+
+    return compose(tone, saturate, rotate, sepia_matrix({"intensity": params["sepia"]}))
+
+
+def sepia_matrix(params):
+    """Sépia misturado às cores originais conforme a intensidade"""
+    intensity = params["intensity"]
+    return affine((1 - intensity) * np.eye(3) + intensity * SEPIA_KERNEL)
+
+
+def vignette_mask(rows, cols, params):
+    """Máscara circular que escurece do centro para as bordas"""
+    X, Y = np.ogrid[0:rows, 0:cols]
+    center_x, center_y = rows / 2, cols / 2
+
+    # Distância ao centro, normalizada pelo raio (1 = distância até o canto)
+    dist_from_center = np.sqrt((X - center_x)**2 + (Y - center_y)**2)
+    max_dist = np.sqrt(center_x**2 + center_y**2) * params["radius"]
+    # A força define o quanto as bordas escurecem (1 = totalmente pretas)
+    return (1 - params["strength"] * np.clip(dist_from_center/max_dist, 0, 1)).astype(np.float32)
+
+
+def cube_sampler(params):
+    """Interpola a LUT do arquivo .cube nas cores BGR recebidas"""
+    cube = load_cube(params["path"])
+
+    def sample(bgr):
+        rgb = bgr[:, ::-1].astype(np.float32) / 255
+        graded = np.clip(cube.sample(rgb) * 255 + 0.5, 0, 255).astype(np.uint8)
+        return np.ascontiguousarray(graded[:, ::-1])
+    return sample
+
+
+register_effect(EffectDefinition(
+    "bw", "Preto e Branco", "pointwise", channels=1,
+    build_matrix=lambda params: affine(GRAY_KERNEL)))
+register_effect(EffectDefinition(
+    "negative", "Negativo", "pointwise",
+    build_lut=lambda params: per_channel(255 - np.arange(256)),
+    build_matrix=lambda params: affine(-np.eye(3), 255)))
+register_effect(EffectDefinition(
+    "sepia", "Sépia", "pointwise", params={"intensity": 1.0},
+    controls={"intensity": ("Intensidade", 0.0, 1.0)},
+    build_matrix=sepia_matrix))
+register_effect(EffectDefinition(
+    "color", "Ajuste de Cor", "pointwise",
+    params={"brightness": 0.0, "contrast": 1.0, "saturation": 1.0, "hue": 0.0, "sepia": 0.0},
+    controls={"brightness": ("Brilho", -1.0, 1.0), "contrast": ("Contraste", 0.0, 3.0),
+              "saturation": ("Saturação", 0.0, 3.0), "hue": ("Matiz (graus)", -180.0, 180.0),
+              "sepia": ("Sépia", 0.0, 1.0)},
+    build_matrix=color_matrix))
+register_effect(EffectDefinition(
+    "posterize", "Posterização", "pointwise", params={"levels": 5},
+    controls={"levels": ("Níveis", 2, 32)},
+    build_lut=posterize_lut))
+register_effect(EffectDefinition(
+    "vignette", "Vinheta", "spatial", params={"strength": 1.0, "radius": 1.0},
+    controls={"strength": ("Força", 0.0, 1.0), "radius": ("Raio", 0.3, 2.0)},
+    build_mask=vignette_mask))
+register_effect(EffectDefinition(
+    "lut", "LUT 3D (.cube)", "pointwise", params={"path": ""},
+    build_sampler=cube_sampler, in_menu=False,
+    validate=lambda params: load_cube(params["path"])))
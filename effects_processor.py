@@ -1,110 +1,542 @@
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
+from effect_registry import get_effect
+
+# Separador dos efeitos em uma cadeia, ex.: "posterize+negative+sepia"
+CHAIN_SEPARATOR = "+"
+
+# LUTs 3D são pré-calculadas em uma grade de 7 bits por canal (128³ cores)
+GRID_BITS = 7
+GRID_SIZE = 1 << GRID_BITS
+INDEX_SUM = np.ones((1, 3))  # Soma das parcelas do índice de cada canal
+
+def stack_frames(frames):
+    """Vista (N*H, W, C) de um lote (N, H, W, C) contíguo; frames isolados passam direto"""
+    if len(frames.shape) == 4:
+        return frames.reshape((-1,) + frames.shape[2:])
+    return frames
+
+def matrix_in_range(matrix):
+    """Indica se a matriz afim leva toda cor uint8 para dentro de [0, 255], sem saturar"""
+    weights = matrix[:, :3] * 255
+    low = matrix[:, 3] + np.minimum(weights, 0).sum(axis=1)
+    high = matrix[:, 3] + np.maximum(weights, 0).sum(axis=1)
+    # Meio nível de folga: o arredondamento leva esses valores ao mesmo uint8
+    return bool((low >= -0.5).all() and (high <= 255.5).all())
 
 class EffectsProcessor:
-    def __init__(self):
-        self.effect_cache = {}  # Cache para efeitos
-        self.vignette_mask = None
-        self.vignette_frame_size = None  # Para verificar se o tamanho do frame mudou
+    def __init__(self, tiles=0, cache_budget_mb=256):
+        """
+        Aplica aos frames os efeitos declarados em effect_registry.
+        Todos os efeitos aceitam um buffer de destino `out` (uint8, contíguo, do mesmo
+        tamanho do frame; 3 canais, ou 1 canal para efeitos em cinza). Com `out`,
+        nenhum efeito aloca arrays por frame: LUTs, matrizes, máscaras e buffers
+        auxiliares são criados uma única vez por definição/tamanho e reaproveitados.
+        Frames grandes são divididos em `tiles` faixas horizontais processadas em
+        paralelo (0 = automático pelo número de núcleos, 1 = desativado).
+        Os pré-cálculos ficam em um cache LRU de até cache_budget_mb, por efeito,
+        parâmetros e tamanho do frame.
+        Os frames de entrada são BGR; a saída é BGR ou, com output_format="rgb", já
+        pronta para exibição (RGB, 3 canais), com a troca de canais embutida no
+        último estágio de cor da cadeia em vez de uma conversão a mais.
+        """
+        # Cache LRU: (tipo, efeito, parâmetros, tamanho) -> cadeia compilada, LUT, matriz ou máscara
+        self.effect_cache = OrderedDict()
+        self.cache_lock = threading.Lock()  # As faixas consultam o cache em paralelo
+        self.cache_budget_bytes = cache_budget_mb * 1024 * 1024
+        self.cache_bytes = 0
+        self.cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self.thread_buffers = threading.local()  # Buffers auxiliares da LUT 3D, por thread
+        self.bake_lock = threading.Lock()  # Uma LUT 3D pedida por duas threads é calculada uma vez
+        self.preparing = set()  # Cadeias sendo compiladas em segundo plano
+        
+        # Execução em faixas: o OpenCV e o NumPy liberam o GIL durante o processamento
+        self.tiles = tiles
+        self.min_tile_pixels = 256 * 1024  # Faixas menores não compensam o despacho
+        # Criado aqui, e não no primeiro uso: a interface, a decodificação e as exportações
+        # chamam o processador ao mesmo tempo. As threads só são iniciadas quando usadas
+        self.executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+
+    def shutdown(self):
+        """Encerra as threads das faixas (ao fechar a aplicação)"""
+        self.executor.shutdown(wait=False)
 
     def clear_cache(self):
         """Limpa o cache de efeitos e máscaras"""
-        self.effect_cache = {}
-        self.vignette_mask = None
-        self.vignette_frame_size = None
+        with self.cache_lock:
+            self.effect_cache = OrderedDict()
+            self.cache_bytes = 0
+        self.thread_buffers = threading.local()
 
-    def apply_effect_to_frame(self, frame, effect_type):
-        """Aplica efeito ao frame (versão simplificada e estável)"""
-        if effect_type == "none":
-            return frame
+    def cache_memory(self):
+        """Retorna (bytes usados, bytes permitidos) pelo cache de pré-cálculos"""
+        return self.cache_bytes, self.cache_budget_bytes
+
+    def cached(self, key, build):
+        """Retorna o valor em cache para a chave, calculando-o com build() se preciso"""
+        with self.cache_lock:
+            entry = self.effect_cache.get(key)
+            if entry is not None:
+                self.effect_cache.move_to_end(key)
+                self.cache_stats["hits"] += 1
+                return entry[0]
+            self.cache_stats["misses"] += 1
         
-        try:
-            if effect_type == "bw":
-                return self.apply_black_and_white(frame)
-            elif effect_type == "negative":
-                return self.apply_negative(frame)
-            elif effect_type == "sepia":
-                return self.apply_sepia(frame)
-            elif effect_type == "posterize":
-                return self.apply_posterize(frame)
-            elif effect_type == "vignette":
-                return self.apply_vignette(frame)
-            else:
+        # Calculado fora do lock: duas faixas podem calcular o mesmo valor, sem prejuízo
+        value = build()
+        size = self.cached_size(value)
+        with self.cache_lock:
+            if key not in self.effect_cache:
+                self.effect_cache[key] = (value, size)
+                self.cache_bytes += size
+            # Descarta os menos usados, mantendo sempre o mais recente
+            while self.cache_bytes > self.cache_budget_bytes and len(self.effect_cache) > 1:
+                _, (_, evicted_size) = self.effect_cache.popitem(last=False)
+                self.cache_bytes -= evicted_size
+                self.cache_stats["evictions"] += 1
+        return value
+
+    def cached_size(self, value):
+        """Memória aproximada de um valor em cache (arrays, inclusive dentro de tuplas e listas)"""
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+        if isinstance(value, (tuple, list)):
+            return sum(self.cached_size(item) for item in value)
+        return 0
+
+    def apply_effect_to_frame(self, frame, effect_type, out=None, output_format="bgr"):
+        """Aplica efeito ao frame, gravando em `out` quando fornecido (sem alocações)"""
+        if effect_type == "none" and output_format == "bgr":
+            if out is None:
                 return frame
+            np.copyto(out, frame)
+            return out
+        
+        try:
+            return self.apply_tiled(frame, effect_type, out, frame.shape[0], output_format)
         except Exception as e:
             print(f"Erro ao aplicar efeito {effect_type}: {e}")
+            return self.unprocessed_output(frame, out, output_format)
+
+    def unprocessed_output(self, frame, out, output_format="bgr"):
+        """
+        Saída de um efeito que falhou: o frame original, convertido para o formato e os
+        canais de `out`. Assim quem passou `out` nunca recebe um buffer não preenchido.
+        """
+        if output_format == "rgb":
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=out)
+        if out is None:
             return frame
+        if len(out.shape) == 2:
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=out)
+        np.copyto(out, frame)
+        return out
 
-    def apply_black_and_white(self, frame):
-        """Aplica efeito preto e branco a um frame"""
-        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    def tile_count(self, frame):
+        """Quantidade de faixas em que a imagem será dividida"""
+        if self.tiles:
+            return max(1, min(self.tiles, frame.shape[0]))
+        pixels = frame.shape[0] * frame.shape[1]
+        return max(1, min(os.cpu_count() or 1, pixels // self.min_tile_pixels))
 
-    def apply_negative(self, frame):
-        """Aplica efeito negativo a um frame"""
-        return 255 - frame
+    def apply_tiled(self, frame, effect_type, out, frame_rows, output_format="bgr"):
+        """Divide a imagem em faixas horizontais e aplica o efeito a elas em paralelo"""
+        # Compila a cadeia uma única vez, antes de dividir o trabalho
+        channels = self.output_channels(effect_type, out, output_format)
+        stages = self.compiled_chain(effect_type, channels, output_format)
+        tiles = self.tile_count(frame)
+        if tiles <= 1:
+            return self.run_stages(frame, stages, out, 0, frame_rows)
+        
+        if out is None:
+            shape = frame.shape[:2] if channels == 1 else frame.shape[:2] + (channels,)
+            out = np.empty(shape, dtype=np.uint8)
+        
+        bounds = np.linspace(0, frame.shape[0], tiles + 1).astype(int)
+        futures = [self.executor.submit(self.run_stages, frame[start:end], stages,
+                                        out[start:end], start, frame_rows)
+                   for start, end in zip(bounds[:-1], bounds[1:])]
+        for future in futures:
+            future.result()
+        return out
 
-    def apply_sepia(self, frame):
-        """Aplica efeito sépia a um frame (versão otimizada)"""
+    def apply_effect_to_batch(self, frames, effect_type, out=None, output_format="bgr"):
+        """
+        Aplica o efeito a um lote (N, H, W, 3) de frames em uma única chamada.
+        Efeitos pontuais tratam o lote como uma imagem alta (N*H, W, 3), pagando o
+        despacho e a chamada ao OpenCV uma vez por lote em vez de uma vez por frame.
+        """
+        if effect_type == "none" and output_format == "bgr":
+            if out is None:
+                return frames
+            np.copyto(out, frames)
+            return out
+        
         try:
-            # Usa LUT (Look-Up Table) para sépia, que é mais rápido
-            sepia_kernel = np.array([[0.272, 0.534, 0.131],
-                                    [0.349, 0.686, 0.168],
-                                    [0.393, 0.769, 0.189]])
-            
-            # Aplicar transformação com OpenCV otimizado
-            sepia_frame = cv2.transform(frame, sepia_kernel)
-            
-            # Clipar valores
-            return np.clip(sepia_frame, 0, 255).astype(np.uint8)
+            if out is not None:
+                self.apply_tiled(stack_frames(frames), effect_type, stack_frames(out), frames.shape[1],
+                                 output_format)
+                return out
+            result = self.apply_tiled(stack_frames(frames), effect_type, None, frames.shape[1],
+                                      output_format)
+            return result.reshape(frames.shape[:3] + result.shape[2:])
         except Exception as e:
-            print(f"Erro no efeito sépia: {e}")
-            return frame
+            print(f"Erro ao aplicar efeito {effect_type} no lote: {e}")
+            if out is not None:
+                self.unprocessed_output(stack_frames(frames), stack_frames(out), output_format)
+                return out
+            result = self.unprocessed_output(stack_frames(frames), None, output_format)
+            return result.reshape(frames.shape[:3] + result.shape[2:])
 
-    def apply_posterize(self, frame):
-        """Aplica efeito de posterização a um frame (versão otimizada)"""
-        try:
-            # Usa uma LUT (Look-Up Table) para posterizar - muito mais rápido
-            levels = 5
-            lut = np.zeros(256, dtype=np.uint8)
-            for i in range(256):
-                lut[i] = np.uint8(np.round(i / (255 / levels)) * (255 / levels))
-            
-            # Aplica a LUT em cada canal
-            if len(frame.shape) == 3:  # Imagem colorida
-                result = cv2.LUT(frame, lut)
-            else:  # Imagem em escala de cinza
-                result = cv2.LUT(frame, lut)
-            
-            return result
-        except Exception as e:
-            print(f"Erro no efeito posterize: {e}")
-            return frame
+    def output_channels(self, effect_type, out, output_format="bgr"):
+        """Canais da saída: os de `out`, 3 para exibição, ou os declarados pelo efeito usado sozinho"""
+        if out is not None:
+            return out.shape[2] if len(out.shape) == 3 else 1
+        if output_format == "rgb":
+            return 3
+        effects = self.parse_chain(effect_type)
+        return effects[0][0].channels if len(effects) == 1 else 3
+
+    def split_chain(self, chain):
+        """Separa a cadeia em efeitos, ignorando separadores entre aspas"""
+        return [part for part in re.findall(r'(?:"[^"]*"|[^+"])+', chain) if part]
+
+    def parse_effect(self, spec):
+        """Separa um efeito no formato nome:chave=valor,chave=valor em (nome, parâmetros)"""
+        name, _, arguments = spec.partition(":")
+        params = {}
+        for argument in re.findall(r'(?:"[^"]*"|[^,"])+', arguments):
+            key, _, value = argument.partition("=")
+            params[key.strip()] = value.strip().strip('"')
+        return name.strip(), params
+
+    def parse_chain(self, chain):
+        """Retorna a lista de (definição, parâmetros completos) dos efeitos da cadeia"""
+        effects = []
+        for spec in self.split_chain(chain):
+            name, params = self.parse_effect(spec)
+            if name == "none":
+                continue
+            definition = get_effect(name)
+            if definition is None:
+                raise ValueError(f"efeito desconhecido: {name}")
+            effects.append((definition, definition.resolve_params(params)))
+        return effects
+
+    def is_valid_chain(self, chain):
+        """Verifica se todos os efeitos da cadeia são conhecidos e têm parâmetros válidos"""
+        for spec in self.split_chain(chain):
+            name, params = self.parse_effect(spec)
+            definition = get_effect(name)
+            if definition is None or not definition.is_valid(params):
+                return False
+        return True
+
+    def effect_label(self, effect):
+        """
+        Nome curto do efeito, seguro para nomes de arquivo: inclui os parâmetros que
+        diferem do padrão (efeitos com arquivo levam o nome dele). Rótulos longos
+        trocam os parâmetros por um hash curto, que continua distinguindo os ajustes.
+        """
+        names, labels = [], []
+        for spec in self.split_chain(effect):
+            name, params = self.parse_effect(spec)
+            names.append(name)
+            definition = get_effect(name)
+            label = name
+            if definition is not None:
+                try:
+                    label = definition.format_params({k: v for k, v in params.items() if k != "path"})
+                except ValueError:
+                    pass
+            if "path" in params:
+                # Arquivos de mesmo nome em pastas diferentes são ajustes diferentes
+                path_hash = hashlib.sha1(os.path.abspath(params["path"]).encode()).hexdigest()[:6]
+                label += "-" + os.path.splitext(os.path.basename(params["path"]))[0] + "-" + path_hash
+            labels.append(label.replace(":", "-"))
+        label = CHAIN_SEPARATOR.join(labels)
+        if len(label) > 80:
+            label = CHAIN_SEPARATOR.join(names) + "-" + hashlib.sha1(effect.encode()).hexdigest()[:8]
+        return re.sub(r"[^\w+.-]", "_", label)
 
-    def apply_vignette(self, frame):
-        """Aplica efeito de vinheta (versão simplificada)"""
+    def precomputed(self, kind, definition, params, *size):
+        """Retorna o pré-cálculo declarado (lut, matrix, sampler ou mask), calculando-o uma vez"""
+        builder = getattr(definition, "build_" + kind)
+        if builder is None:
+            return None
+        key = (kind, definition.name, self.params_key(params)) + size
+        return self.cached(key, lambda: builder(*size, params))
+
+    def params_key(self, params):
+        """Chave de cache dos parâmetros, incluindo a versão do arquivo usado pelo efeito"""
+        return tuple(sorted(params.items())) + (self.source_version(params.get("path")),)
+
+    def source_version(self, path):
+        """Data de modificação do arquivo do efeito: um .cube salvo de novo é recalculado"""
+        if not path:
+            return None
         try:
-            rows, cols = frame.shape[:2]
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def chain_key(self, chain, channels=3, output_format="bgr"):
+        """Chave de cache da cadeia compilada"""
+        key = ("chain", chain, channels, output_format)
+        if "path=" not in chain:
+            return key
+        versions = tuple(self.source_version(self.parse_effect(spec)[1].get("path"))
+                         for spec in self.split_chain(chain))
+        return key + versions
+
+    def compiled_chain(self, chain, channels=3, output_format="bgr"):
+        """Retorna os estágios da cadeia, compilando-a só na primeira vez"""
+        return self.cached(self.chain_key(chain, channels, output_format),
+                           lambda: self.compile_chain(chain, channels, output_format))
+
+    def chain_ready(self, chain, channels=3, output_format="bgr"):
+        """Indica se a cadeia já está compilada (aplicá-la não fará pré-cálculos demorados)"""
+        key = self.chain_key(chain, channels, output_format)
+        with self.cache_lock:
+            return key in self.effect_cache
+
+    def prepare_chain(self, chain, channels=3, output_format="bgr"):
+        """Compila a cadeia em segundo plano (ex.: LUT 3D), sem bloquear quem chamou"""
+        if chain == "none" or self.chain_ready(chain, channels, output_format):
+            return
+        key = (chain, channels, output_format)
+        with self.cache_lock:
+            if key in self.preparing:
+                return
+            self.preparing.add(key)
+        
+        def compile_in_background():
+            try:
+                self.compiled_chain(chain, channels, output_format)
+            except Exception as e:
+                print(f"Erro ao preparar efeito {chain}: {e}")
+            finally:
+                with self.cache_lock:
+                    self.preparing.discard(key)
+        threading.Thread(target=compile_in_background, daemon=True).start()
+
+    def run_stages(self, frame, stages, out=None, row_offset=0, frame_rows=None):
+        """
+        Executa os estágios compilados sobre a imagem (ou uma faixa dela, a partir de
+        row_offset, em uma imagem formada por frames empilhados de frame_rows linhas).
+        """
+        if len(frame.shape) == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        destination = out
+        # O primeiro estágio lê o frame; os seguintes trabalham no próprio `out`
+        for kind, data in stages:
+            if kind == "lut":
+                frame = cv2.LUT(frame, data, dst=out)
+            elif kind == "matrix":
+                frame = cv2.transform(frame, data, dst=out)
+            elif kind == "lut3d":
+                frame = self.apply_lut3d(frame, *data, out=out)
+            elif kind == "swap":
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=out)
+            else:
+                frame = self.apply_mask(frame, *data, out=out, row_offset=row_offset,
+                                        frame_rows=frame_rows)
+            out = frame
+        return destination if destination is not None else frame
+
+    def apply_lut3d(self, frame, index_lut, table, out=None):
+        """Aplica uma LUT 3D pré-calculada: índice na grade de 7 bits e uma única consulta"""
+        rows, cols = frame.shape[:2]
+        # Cada thread (inclusive as das faixas) tem seus buffers; eles são reaproveitados
+        # enquanto couberem (lotes e faixas menores usam só as primeiras linhas)
+        buffers = getattr(self.thread_buffers, "lut3d", None)
+        if buffers is None or buffers[0].shape[0] < rows or buffers[0].shape[1] != cols:
+            buffers = (np.empty((rows, cols, 3), dtype=np.int32),
+                       np.empty((rows, cols), dtype=np.int32),
+                       np.empty((rows, cols), dtype=np.intp),
+                       np.empty((rows, cols), dtype=np.uint32))
+            self.thread_buffers.lut3d = buffers
+        channel_index, index, take_index, packed = [buffer[:rows] for buffer in buffers]
+        
+        # Cada canal vira sua parcela do índice (b << 14 | g << 7 | r) em uma LUT int32
+        cv2.LUT(frame, index_lut, dst=channel_index)
+        cv2.transform(channel_index, INDEX_SUM, dst=index)
+        # take() só dispensa cópias internas com índices intp e mode="clip"
+        np.copyto(take_index, index)
+        # A tabela guarda BGRA empacotado em uint32: a consulta traz os 3 canais de uma vez
+        table.take(take_index, out=packed, mode="clip")
+        return cv2.cvtColor(packed.view(np.uint8).reshape(rows, cols, 4), cv2.COLOR_BGRA2BGR, dst=out)
+
+    def apply_mask(self, frame, definition, params, out=None, row_offset=0, frame_rows=None):
+        """
+        Aplica um efeito espacial (uma multiplicação pela máscara em cache).
+        `frame` pode ser uma faixa de linhas (a partir de row_offset) de uma imagem
+        formada por frames empilhados de frame_rows linhas cada.
+        """
+        rows, cols = frame.shape[:2]
+        frame_rows = frame_rows or rows
+        channels = frame.shape[2] if len(frame.shape) == 3 else 1
+        mask = self.channel_mask(definition, params, frame_rows, cols, channels)
+        if out is None:
+            out = np.empty_like(frame)
+        
+        # Uma multiplicação saturada em uint8 por trecho de frame coberto pela faixa
+        row = 0
+        while row < rows:
+            mask_row = (row_offset + row) % frame_rows
+            count = min(rows - row, frame_rows - mask_row)
+            cv2.multiply(frame[row:row + count], mask[mask_row:mask_row + count],
+                         dst=out[row:row + count], dtype=cv2.CV_8U)
+            row += count
+        return out
+
+    def channel_mask(self, definition, params, rows, cols, channels):
+        """Máscara do efeito já replicada nos canais do frame, em cache por tamanho"""
+        if channels == 1:
+            return self.precomputed("mask", definition, params, rows, cols)
+        
+        def replicate():
+            mask = self.precomputed("mask", definition, params, rows, cols)
+            return np.ascontiguousarray(np.repeat(mask[:, :, None], channels, axis=2))
+        key = ("channel_mask", definition.name, self.params_key(params), rows, cols, channels)
+        return self.cached(key, replicate)
+
+    def compile_chain(self, chain, channels=3, output_format="bgr"):
+        """
+        Compila a cadeia em estágios: efeitos pontuais consecutivos viram uma única
+        LUT (composição exata), uma única matriz afim 3x4 (enquanto nenhum efeito do
+        grupo saturar) ou, se algum deles só declarar um amostrador, uma única LUT 3D.
+        """
+        # Divide a cadeia em efeitos espaciais e sequências de efeitos pontuais
+        stages = []
+        run = []
+        for definition, params in self.parse_chain(chain):
+            if definition.kind == "spatial":
+                stages.extend(self.compile_run(run))
+                stages.append(("mask", (definition, params)))
+                run = []
+            else:
+                run.append((definition, params))
+        stages.extend(self.compile_run(run))
+        
+        # Saída em cinza: a matriz final tem as 3 linhas iguais, basta a primeira
+        if channels == 1 and stages and stages[-1][0] == "matrix":
+            stages[-1] = ("matrix", stages[-1][1][:1])
+        elif channels == 3 and output_format == "rgb":
+            stages = self.fold_channel_swap(stages)
+        return stages
+
+    def fold_channel_swap(self, stages):
+        """
+        Embute a troca BGR -> RGB nos estágios: ela atravessa LUTs por canal (trocando
+        as colunas) e máscaras (iguais nos 3 canais) até o último estágio de cor, onde
+        vira a inversão das linhas da matriz ou da ordem dos bytes da LUT 3D.
+        Só sem nenhum desses estágios a troca vira um estágio próprio, no início.
+        """
+        stages = list(stages)
+        for i in range(len(stages) - 1, -1, -1):
+            kind, data = stages[i]
+            if kind == "matrix":
+                stages[i] = ("matrix", np.ascontiguousarray(data[::-1]))
+                return stages
+            if kind == "lut3d":
+                index_lut, table = data
+                swapped = table.view(np.uint8).reshape(-1, 4)[:, [2, 1, 0, 3]]
+                stages[i] = ("lut3d", (index_lut, np.ascontiguousarray(swapped).view(np.uint32).ravel()))
+                return stages
+            if kind == "lut" and len(data.shape) == 3:
+                stages[i] = ("lut", np.ascontiguousarray(data[:, :, ::-1]))
+        return [("swap", None)] + stages
+
+    def compile_run(self, run):
+        """Compila uma sequência de efeitos pontuais em um ou poucos estágios"""
+        forms = [self.pointwise_forms(definition, params) for definition, params in run]
+        if any(lut is None and matrix is None for lut, matrix in forms):
+            # Sem forma fechada para algum efeito, toda a sequência vira a mesma LUT 3D.
+            # Ela é guardada em BGR, à parte da cadeia: a saída RGB só troca os bytes da tabela
+            key = ("lut3d",) + tuple((definition.name, self.params_key(params))
+                                     for definition, params in run)
+            with self.bake_lock:
+                return [("lut3d", self.cached(key, lambda: self.bake_lut3d(run)))]
+        
+        stages = []
+        group_lut, group_matrix = None, None
+        for lut, matrix in forms:
+            if group_lut is None and group_matrix is None:
+                group_lut, group_matrix = lut, matrix
+                continue
             
-            # Verifica se já temos uma máscara para este tamanho de frame
-            if self.vignette_mask is None or self.vignette_frame_size != (rows, cols):
-                # Cria a máscara de vinheta de forma simplificada
-                X, Y = np.ogrid[0:rows, 0:cols]
-                center_x, center_y = rows / 2, cols / 2
-                
-                # Criar uma máscara circular
-                dist_from_center = np.sqrt((X - center_x)**2 + (Y - center_y)**2)
-                # Normalizar pelo raio máximo
-                max_dist = np.sqrt(center_x**2 + center_y**2)
-                # Criar efeito de desvanecimento suave
-                self.vignette_mask = np.clip(1 - dist_from_center/max_dist, 0, 1)
-                self.vignette_frame_size = (rows, cols)
+            # Mantém as formas em que o grupo inteiro ainda pode ser composto
+            fused_lut = None
+            if group_lut is not None and lut is not None:
+                fused_lut = np.stack([lut[group_lut[:, c], c] for c in range(3)], axis=1)
+            # Matrizes só se compõem se o grupo não satura: a saturação entre dois efeitos
+            # (ex.: brilho +0.5 seguido de -0.5) faz parte do resultado que o usuário empilhou
+            fused_matrix = None
+            if group_matrix is not None and matrix is not None and matrix_in_range(group_matrix):
+                fused_matrix = matrix[:, :3] @ group_matrix
+                fused_matrix[:, 3] += matrix[:, 3]
             
-            # Aplicar máscara aos canais BGR
-            result = frame.copy()
-            for i in range(3):
-                result[:, :, i] = result[:, :, i] * self.vignette_mask
-                
-            return result.astype(np.uint8)
-        except Exception as e:
-            print(f"Erro no efeito vinheta: {e}")
-            return frame
\ No newline at end of file
+            if fused_lut is None and fused_matrix is None:
+                stages.extend(self.flush_group(group_lut, group_matrix))
+                group_lut, group_matrix = lut, matrix
+            else:
+                group_lut, group_matrix = fused_lut, fused_matrix
+        
+        stages.extend(self.flush_group(group_lut, group_matrix))
+        return stages
+
+    def bake_lut3d(self, run):
+        """
+        Pré-calcula a sequência de efeitos como LUT 3D: retorna a LUT por canal com o
+        índice na grade e a tabela BGRA empacotada com o resultado de cada cor da grade.
+        """
+        # Efeitos com LUT 1D no início da sequência entram exatos no cálculo do índice
+        prefix = np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)
+        while run and self.pointwise_forms(*run[0])[0] is not None:
+            lut = self.pointwise_forms(*run[0])[0]
+            prefix = np.stack([lut[prefix[:, c], c] for c in range(3)], axis=1)
+            run = run[1:]
+        cell = np.round(prefix.astype(np.int32) * (GRID_SIZE - 1) / 255).astype(np.int32)
+        index_lut = np.stack([cell[:, 0] << (2 * GRID_BITS), cell[:, 1] << GRID_BITS, cell[:, 2]],
+                             axis=1).reshape(1, 256, 3)
+        
+        # Imagem (N³, 1, 3) com todas as cores da grade, na ordem do índice b, g, r
+        levels = np.round(np.arange(GRID_SIZE) * 255 / (GRID_SIZE - 1)).astype(np.uint8)
+        b, g, r = np.meshgrid(levels, levels, levels, indexing="ij")
+        grid = np.stack([b.ravel(), g.ravel(), r.ravel()], axis=1).reshape(-1, 1, 3)
+        
+        for definition, params in run:
+            lut, matrix = self.pointwise_forms(definition, params)
+            if lut is not None:
+                grid = cv2.LUT(grid, lut.reshape(1, 256, 3))
+            elif matrix is not None:
+                grid = cv2.transform(grid, matrix)
+            else:
+                sample = self.precomputed("sampler", definition, params)
+                grid = sample(grid.reshape(-1, 3)).reshape(-1, 1, 3)
+        
+        packed = cv2.cvtColor(grid, cv2.COLOR_BGR2BGRA)
+        return index_lut, packed.reshape(-1, 4).view(np.uint32).ravel()
+
+    def flush_group(self, lut, matrix):
+        """Converte um grupo de efeitos pontuais no estágio mais barato disponível"""
+        if lut is not None:
+            # LUT igual nos 3 canais é aplicada mais rápido como tabela única
+            if (lut == lut[:, :1]).all():
+                return [("lut", lut[:, 0].copy())]
+            return [("lut", lut.reshape(1, 256, 3))]
+        if matrix is not None:
+            return [("matrix", matrix)]
+        return []
+
+    def pointwise_forms(self, definition, params):
+        """Retorna as formas (LUT 256x3, matriz afim 3x4) declaradas por um efeito pontual"""
+        return (self.precomputed("lut", definition, params),
+                self.precomputed("matrix", definition, params))
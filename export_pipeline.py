@@ -0,0 +1,207 @@
+import time
+import queue
+import threading
+import cv2
+import numpy as np
+
+# Estágios do pipeline, na ordem em que os lotes passam por eles
+STAGES = ("decode", "effect", "write")
+
+
+def stage_report(stats):
+    """Texto com o tempo ocupado/ocioso de cada estágio (o estágio mais ocupado limita a exportação)"""
+    return ", ".join(f"{stage}: {times['busy']:.1f}s ocupado / {times['idle']:.1f}s ocioso"
+                     for stage, times in stats.items())
+
+
+class ExportPipeline:
+    def __init__(self, cap, writer, effects_processor, effect, batch_frames=8, effect_workers=2,
+                 queue_batches=2, frame_limit=None, buffer_budget_mb=128):
+        """
+        Exportação em estágios sobrepostos: uma thread decodifica lotes de frames, um
+        pool de threads aplica o efeito e a thread que chama run() grava os lotes na
+        ordem original. Os estágios trocam lotes por filas limitadas; como os buffers
+        dos lotes são pré-alocados e reciclados, um estágio lento segura os anteriores
+        (backpressure) sem alocar memória. O OpenCV libera o GIL na leitura, nos efeitos
+        e na gravação, então os estágios rodam de fato em paralelo.
+        Os buffers ocupam no máximo buffer_budget_mb: em resoluções altas os lotes encolhem.
+        """
+        self.cap = cap
+        self.writer = writer
+        self.effects_processor = effects_processor
+        self.effect = effect
+        self.batch_frames = batch_frames
+        self.effect_workers = max(1, effect_workers)
+        self.queue_batches = queue_batches  # Lotes que podem aguardar entre dois estágios
+        self.frame_limit = frame_limit  # Frames a exportar (None = até o fim do vídeo)
+        self.buffer_budget_bytes = buffer_budget_mb * 1024 * 1024
+
+        # Tempo ocupado e ocioso (esperando fila ou buffer) de cada estágio, em segundos
+        self.stats = {stage: {"busy": 0.0, "idle": 0.0} for stage in STAGES}
+        self.frames_written = 0
+        self.stop_event = threading.Event()
+        self.error = None
+        self.stats_lock = threading.Lock()
+
+    def allocate_slots(self):
+        """
+        Pré-aloca os buffers dos lotes em circulação. O efeito é aplicado no próprio
+        buffer lido, então cada lote ocupa um único buffer do início ao fim.
+        """
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # Um lote com o decodificador, um por thread de efeito, um com o gravador e os da fila
+        count = self.effect_workers + self.queue_batches + 2
+        frame_bytes = width * height * 3
+        self.batch_frames = max(1, min(self.batch_frames, self.buffer_budget_bytes // (count * frame_bytes)))
+        return [np.empty((self.batch_frames, height, width, 3), dtype=np.uint8) for _ in range(count)]
+
+    def add_time(self, stage, kind, seconds):
+        """Acumula o tempo de um estágio (as threads do pool de efeitos somam no mesmo contador)"""
+        with self.stats_lock:
+            self.stats[stage][kind] += seconds
+
+    def wait_get(self, source, stage):
+        """Retira um item da fila contabilizando a espera como ociosidade; None se o pipeline parar"""
+        start = time.perf_counter()
+        while not self.stop_event.is_set():
+            try:
+                item = source.get(timeout=0.1)
+                self.add_time(stage, "idle", time.perf_counter() - start)
+                return item
+            except queue.Empty:
+                pass
+        return None
+
+    def wait_put(self, target, item, stage):
+        """Coloca um item na fila, esperando vaga (backpressure); False se o pipeline parar"""
+        start = time.perf_counter()
+        while not self.stop_event.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                self.add_time(stage, "idle", time.perf_counter() - start)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def fail(self, error):
+        """Registra o primeiro erro de um estágio e interrompe os demais"""
+        if self.error is None:
+            self.error = error
+        self.stop_event.set()
+
+    def decode_loop(self, free_slots, decoded):
+        """Estágio 1: lê lotes de frames para buffers livres"""
+        try:
+            sequence = 0
+            remaining = self.frame_limit
+            while remaining is None or remaining > 0:
+                slot = self.wait_get(free_slots, "decode")
+                if slot is None:
+                    return
+                frames = slot
+                wanted = self.batch_frames if remaining is None else min(self.batch_frames, remaining)
+
+                start = time.perf_counter()
+                count = 0
+                while count < wanted and self.cap.read(frames[count])[0]:
+                    count += 1
+                self.add_time("decode", "busy", time.perf_counter() - start)
+
+                if count == 0:
+                    break
+                if not self.wait_put(decoded, (sequence, slot, count), "decode"):
+                    return
+                sequence += 1
+                if remaining is not None:
+                    remaining -= count
+                if count < wanted:
+                    break
+        except Exception as e:
+            self.fail(e)
+        finally:
+            # Um marcador de fim para cada thread de efeito
+            for _ in range(self.effect_workers):
+                self.wait_put(decoded, None, "decode")
+
+    def effect_loop(self, decoded, processed):
+        """Estágio 2: aplica o efeito a cada lote, direto no buffer de saída do slot"""
+        try:
+            while True:
+                item = self.wait_get(decoded, "effect")
+                if item is None:
+                    break
+                sequence, frames, count = item
+
+                start = time.perf_counter()
+                self.effects_processor.apply_effect_to_batch(frames[:count], self.effect,
+                                                             out=frames[:count], output_format="bgr")
+                self.add_time("effect", "busy", time.perf_counter() - start)
+
+                if not self.wait_put(processed, item, "effect"):
+                    return
+        except Exception as e:
+            self.fail(e)
+        finally:
+            self.wait_put(processed, None, "effect")
+
+    def run(self, is_cancelled=lambda: False, on_progress=None):
+        """
+        Executa o pipeline, gravando nesta thread; retorna False se for cancelado.
+        on_progress(frames gravados) é chamado após cada lote gravado.
+        """
+        slots = self.allocate_slots()
+        free_slots = queue.Queue()
+        for slot in slots:
+            free_slots.put(slot)
+        decoded = queue.Queue(maxsize=self.queue_batches)
+        processed = queue.Queue(maxsize=self.queue_batches)
+
+        threads = [threading.Thread(target=self.decode_loop, args=(free_slots, decoded), daemon=True)]
+        threads += [threading.Thread(target=self.effect_loop, args=(decoded, processed), daemon=True)
+                    for _ in range(self.effect_workers)]
+        for thread in threads:
+            thread.start()
+
+        # Estágio 3: grava os lotes na ordem de leitura (o pool pode terminá-los fora de ordem)
+        cancelled = False
+        pending = {}
+        next_sequence = 0
+        finished_workers = 0
+        try:
+            while finished_workers < self.effect_workers:
+                if is_cancelled():
+                    cancelled = True
+                    break
+                item = self.wait_get(processed, "write")
+                if item is None:
+                    if self.stop_event.is_set():
+                        break
+                    finished_workers += 1
+                    continue
+                pending[item[0]] = item
+
+                while next_sequence in pending:
+                    _, slot, count = pending.pop(next_sequence)
+                    start = time.perf_counter()
+                    for frame in slot[:count]:
+                        self.writer.write(frame)
+                    self.add_time("write", "busy", time.perf_counter() - start)
+                    self.frames_written += count
+                    next_sequence += 1
+                    free_slots.put(slot)
+                    if on_progress is not None:
+                        on_progress(self.frames_written)
+        finally:
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+
+        if self.error is not None:
+            raise self.error
+        return not cancelled
+
+    def report(self):
+        """Resumo legível do tempo ocupado/ocioso de cada estágio"""
+        return f"{self.frames_written} frames - {stage_report(self.stats)}"
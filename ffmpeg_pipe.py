@@ -0,0 +1,230 @@
+import shutil
+import tempfile
+import subprocess
+import cv2
+import numpy as np
+
+# Bytes por pixel de cada formato de saída suportado
+PIXEL_FORMAT_CHANNELS = {"bgr24": 3, "rgb24": 3, "gray": 1}
+
+_ffmpeg_available = None
+
+
+def ffmpeg_available():
+    """Verifica (uma única vez) se o executável do FFmpeg está no PATH"""
+    global _ffmpeg_available
+    if _ffmpeg_available is None:
+        _ffmpeg_available = shutil.which("ffmpeg") is not None
+    return _ffmpeg_available
+
+
+class FFmpegPipeCapture:
+    def __init__(self, file_path, size, fps, pixel_format="bgr24", resample=False):
+        """
+        Backend de decodificação alternativo ao cv2.VideoCapture.
+        O FFmpeg já entrega os frames redimensionados para `size` (e no formato de
+        pixel pedido), em rawvideo pelo pipe, lidos com readinto direto em buffers
+        pré-alocados. Implementa a parte da interface do VideoCapture usada pelo VideoEngine.
+        Com resample=True o FFmpeg também converte o vídeo para `fps` frames por segundo.
+        """
+        self.file_path = file_path
+        self.width, self.height = size
+        self.fps = fps
+        self.pixel_format = pixel_format
+        self.resample = resample
+        self.channels = PIXEL_FORMAT_CHANNELS[pixel_format]
+        self.frame_bytes = self.width * self.height * self.channels
+
+        self.process = None
+        self.position = 0  # Próximo frame que será lido do pipe
+        self.scratch = None  # Buffer reaproveitado por grab()
+        self.opened = ffmpeg_available()
+
+    def isOpened(self):
+        return self.opened
+
+    def get(self, prop):
+        """Retorna as propriedades do fluxo já redimensionado"""
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.position
+        return 0
+
+    def set(self, prop, value):
+        """Reposiciona o fluxo; o FFmpeg é reiniciado no próximo read/grab"""
+        if prop != cv2.CAP_PROP_POS_FRAMES:
+            return False
+        self.stop_process()
+        self.position = int(value)
+        return True
+
+    def start_process(self):
+        """Inicia o FFmpeg a partir da posição atual"""
+        # Meio frame antes do alvo: a busca precisa do FFmpeg descarta os anteriores
+        start_time = max(0.0, (self.position - 0.5) / self.fps) if self.fps else 0.0
+        video_filter = f"scale={self.width}:{self.height}:flags=bilinear"
+        if self.resample:
+            video_filter = f"fps={self.fps:.6f}," + video_filter
+        cmd = [
+            "ffmpeg",
+            "-v", "error",
+            "-nostdin",
+            "-ss", f"{start_time:.6f}",
+            "-i", self.file_path,
+            "-an", "-sn",
+            "-vf", video_filter,
+            "-f", "rawvideo",
+            "-pix_fmt", self.pixel_format,
+            "-"
+        ]
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                        bufsize=0)
+
+    def stop_process(self):
+        """Encerra o processo do FFmpeg, se houver"""
+        if self.process is not None:
+            self.process.kill()
+            self.process.stdout.close()
+            self.process.wait()
+            self.process = None
+
+    def read_into(self, buffer):
+        """Preenche o buffer com exatamente um frame lido do pipe"""
+        if self.process is None:
+            self.start_process()
+
+        view = memoryview(buffer).cast("B")
+        filled = 0
+        while filled < self.frame_bytes:
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:
+                return False
+            filled += count
+        self.position += 1
+        return True
+
+    def read(self, image=None):
+        """Lê o próximo frame, direto em `image` quando fornecido (deve ser contíguo)"""
+        shape = (self.height, self.width, self.channels) if self.channels > 1 else (self.height, self.width)
+        if image is None:
+            image = np.empty(shape, dtype=np.uint8)
+        if not self.read_into(image):
+            return False, None
+        return True, image
+
+    def grab(self):
+        """Avança um frame descartando os bytes (a decodificação já ocorreu no FFmpeg)"""
+        if self.scratch is None:
+            self.scratch = np.empty(self.frame_bytes, dtype=np.uint8)
+        return self.read_into(self.scratch)
+
+    def release(self):
+        self.stop_process()
+        self.opened = False
+
+
+class FFmpegPipeWriter:
+    def __init__(self, output_path, size, fps, audio_source=None, pixel_format="bgr24"):
+        """
+        Alternativa ao cv2.VideoWriter que envia os frames em rawvideo pelo stdin de
+        um processo FFmpeg. Com audio_source, o FFmpeg lê o áudio direto do arquivo
+        original e grava o arquivo final em uma única passada, sem vídeo temporário.
+        Implementa a parte da interface do VideoWriter usada na exportação.
+        """
+        self.output_path = output_path
+        self.width, self.height = size
+        self.fps = fps
+        self.audio_source = audio_source
+        self.pixel_format = pixel_format
+        self.frame_bytes = self.width * self.height * PIXEL_FORMAT_CHANNELS[pixel_format]
+        self.error_log = None  # Arquivo temporário com a saída de erro do FFmpeg
+        self.ended = False  # O FFmpeg já terminou o arquivo (o áudio acabou antes, com -shortest)
+        self.process = self.start_process() if ffmpeg_available() else None
+
+    def start_process(self):
+        """Inicia o FFmpeg lendo os frames do stdin (e o áudio do arquivo original, se houver)"""
+        cmd = [
+            "ffmpeg",
+            "-v", "error",
+            "-f", "rawvideo",
+            "-pix_fmt", self.pixel_format,
+            "-s", f"{self.width}x{self.height}",
+            "-r", f"{self.fps:.6f}",
+            "-i", "-"
+        ]
+        if self.audio_source is not None:
+            # "?" torna o áudio opcional: vídeos sem áudio são exportados só com o vídeo
+            cmd += ["-i", self.audio_source, "-map", "0:v:0", "-map", "1:a:0?", "-c:a", "aac", "-shortest"]
+        cmd += [
+            "-c:v", "mpeg4",
+            "-q:v", "3",
+            "-pix_fmt", "yuv420p",
+            self.output_path,
+            "-y"
+        ]
+        # A saída de erro vai para um arquivo: um pipe que ninguém lê durante a exportação
+        # encheria com mensagens repetidas (ex.: áudio danificado) e travaria o FFmpeg
+        self.error_log = tempfile.TemporaryFile()
+        return subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                stderr=self.error_log)
+
+    def error_output(self):
+        """Final da saída de erro do FFmpeg (as últimas mensagens explicam a falha)"""
+        self.error_log.seek(0, 2)
+        self.error_log.seek(max(0, self.error_log.tell() - 4096))
+        return self.error_log.read().decode(errors="replace").strip()
+
+    def close_error_log(self):
+        """Descarta o arquivo temporário da saída de erro"""
+        if self.error_log is not None:
+            self.error_log.close()
+            self.error_log = None
+
+    def isOpened(self):
+        return self.process is not None and self.process.poll() is None
+
+    def write(self, frame):
+        """Envia um frame (contíguo, no tamanho e formato declarados) ao FFmpeg"""
+        if self.ended:
+            return
+        try:
+            self.process.stdin.write(memoryview(np.ascontiguousarray(frame)).cast("B"))
+        except BrokenPipeError:
+            self.process.wait()
+            if self.process.returncode != 0:
+                raise RuntimeError(f"o FFmpeg encerrou durante a exportação: {self.error_output()}")
+            # Com -shortest o FFmpeg termina quando o áudio acaba; os frames restantes são descartados
+            self.ended = True
+
+    def release(self):
+        """Fecha o stdin e espera o FFmpeg terminar de gravar o arquivo"""
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
+        try:
+            if process.returncode != 0:
+                raise RuntimeError(f"falha ao codificar o vídeo: {self.error_output()}")
+        finally:
+            self.close_error_log()
+
+    def abort(self):
+        """Interrompe o FFmpeg sem finalizar o arquivo (exportação cancelada)"""
+        if self.process is not None:
+            self.process.kill()
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+            self.process.wait()
+            self.process = None
+        self.close_error_log()
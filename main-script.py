@@ -1,10 +1,28 @@
 import sys
+import argparse
 import tkinter as tk
 from video_player import VideoPlayer
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Player de Vídeo Avançado")
+    parser.add_argument("--buffer-mb", type=int, default=256,
+                        help="Memória máxima do buffer de frames decodificados, em MB (padrão: 256)")
+    parser.add_argument("--effect-tiles", type=int, default=0,
+                        help="Faixas processadas em paralelo por frame nos efeitos (0 = automático, 1 = desativado)")
+    parser.add_argument("--effect-cache-mb", type=int, default=256,
+                        help="Memória máxima das LUTs, matrizes e máscaras dos efeitos em cache, em MB (padrão: 256)")
+    parser.add_argument("--export-workers", type=int, default=0,
+                        help="Processos que exportam trechos do vídeo em paralelo (0 = um por núcleo, 1 = desativado)")
+    parser.add_argument("--export-jobs", type=int, default=0,
+                        help="Itens da fila de exportação processados ao mesmo tempo (0 = um por núcleo)")
+    parser.add_argument("--export-memory-mb", type=int, default=0,
+                        help="Memória estimada máxima das exportações simultâneas, em MB (0 = metade da RAM)")
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = VideoPlayer(root)
+    app = VideoPlayer(root, buffer_budget_mb=args.buffer_mb, effect_tiles=args.effect_tiles,
+                      effect_cache_mb=args.effect_cache_mb, export_workers=args.export_workers,
+                      export_jobs=args.export_jobs, export_memory_mb=args.export_memory_mb)
     
     # Configurar o comportamento de fechamento
     root.protocol("WM_DELETE_WINDOW", app.on_close)
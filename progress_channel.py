@@ -0,0 +1,98 @@
+import time
+import threading
+
+
+def format_duration(seconds):
+    """Duração em m:ss (ou h:mm:ss)"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def format_progress(progress):
+    """Texto legível de um progresso: porcentagem, fps, fator de tempo real e tempo restante"""
+    text = f"{progress['fraction']:.0%} - {progress['fps']:.0f} fps"
+    if progress["realtime"] is not None:
+        text += f" ({progress['realtime']:.1f}x tempo real)"
+    if progress["done"]:
+        text += f" - concluído em {format_duration(progress['elapsed'])}"
+    elif progress["eta"] is not None:
+        text += f" - restam {format_duration(progress['eta'])}"
+    return text
+
+
+class ProgressChannel:
+    def __init__(self, total_frames, video_fps=0, on_update=None, min_interval=0.25, smoothing=0.3):
+        """
+        Canal de progresso de uma exportação, independente da interface gráfica.
+        update() pode ser chamado a cada lote, de qualquer thread: as atualizações são
+        agrupadas e on_update(progresso) é chamado no máximo uma vez a cada min_interval
+        segundos, sempre com o valor mais recente. Sem on_update, o último progresso
+        pode ser consultado com snapshot() (ex.: para registrar em log).
+
+        O progresso é um dicionário com frames, total_frames, fraction, fps (média móvel
+        exponencial com peso `smoothing`), realtime (fps / fps do vídeo), eta e elapsed
+        (em segundos) e done.
+        """
+        self.total_frames = max(1, total_frames)
+        self.video_fps = video_fps
+        self.on_update = on_update
+        self.min_interval = min_interval
+        self.smoothing = smoothing
+
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+        self.last_time = self.start_time  # Momento e frames da última medição
+        self.last_frames = 0
+        self.frames = 0
+        self.rate = 0.0
+        self.current = self.build_progress(self.start_time, done=False)
+
+    def build_progress(self, now, done):
+        """Monta o dicionário de progresso a partir da medição atual"""
+        remaining = max(0, self.total_frames - self.frames)
+        return {
+            "frames": self.frames,
+            "total_frames": self.total_frames,
+            "fraction": min(1.0, self.frames / self.total_frames),
+            "fps": self.rate,
+            "realtime": self.rate / self.video_fps if self.video_fps else None,
+            "eta": 0.0 if done else (remaining / self.rate if self.rate > 0 else None),
+            "elapsed": now - self.start_time,
+            "done": done,
+        }
+
+    def update(self, frames):
+        """Registra os frames concluídos; repassa o progresso se o intervalo mínimo passou"""
+        now = time.perf_counter()
+        with self.lock:
+            self.frames = frames
+            elapsed = now - self.last_time
+            if elapsed < self.min_interval:
+                return
+            rate = (frames - self.last_frames) / elapsed
+            # A média móvel suaviza a variação entre lotes sem esconder mudanças de ritmo
+            self.rate = rate if self.rate == 0 else self.smoothing * rate + (1 - self.smoothing) * self.rate
+            self.last_time, self.last_frames = now, frames
+            self.current = progress = self.build_progress(now, done=False)
+
+        if self.on_update is not None:
+            self.on_update(progress)
+
+    def finish(self):
+        """Encerra o canal, repassando o progresso final com o fps médio de toda a exportação"""
+        now = time.perf_counter()
+        with self.lock:
+            elapsed = now - self.start_time
+            self.rate = self.frames / elapsed if elapsed > 0 else 0.0
+            self.current = progress = self.build_progress(now, done=True)
+
+        if self.on_update is not None:
+            self.on_update(progress)
+        return progress
+
+    def snapshot(self):
+        """Último progresso medido"""
+        with self.lock:
+            return dict(self.current)
@@ -0,0 +1,166 @@
+import os
+import math
+import tempfile
+import threading
+import cv2
+import numpy as np
+from video_index import CACHE_DIR, cache_path_for, load_cache, save_cache, touch_cache
+from ffmpeg_pipe import FFmpegPipeCapture, ffmpeg_available
+
+
+class ScrubProxy:
+    def __init__(self, file_path, budget_mb=512, max_fps=10, max_width=320, min_width=160):
+        """
+        Proxy de baixa resolução de um vídeo para exibição ao arrastar o slider.
+        Gerado uma única vez em segundo plano em um .npy (N, H, W, 3) no disco e
+        lido por memory-map, então só as páginas acessadas ocupam memória.
+        O tamanho do arquivo é limitado por budget_mb, reduzindo resolução e FPS.
+        """
+        self.file_path = file_path
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.max_fps = max_fps
+        self.max_width = max_width
+        self.min_width = min_width
+
+        self.frames = None  # Array (N, H, W, 3) em BGR, mapeado do disco
+        self.interval_ms = 1000 / max_fps
+        self.frames_ready = 0  # Frames já gravados (o proxy pode ser usado durante a geração)
+        self.ready = False
+        self.cancelled = False
+        self.thread = None
+
+    def generate_async(self):
+        """Carrega o proxy do cache ou o gera em uma thread separada"""
+        self.thread = threading.Thread(target=self.load_or_generate, daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        """Interrompe a geração (por exemplo, ao abrir outro vídeo)"""
+        self.cancelled = True
+
+    def load_or_generate(self):
+        """Mapeia o proxy do disco, gerando-o se ainda não existir"""
+        try:
+            proxy_path = cache_path_for(self.file_path, ".proxy.npy")
+            meta_path = cache_path_for(self.file_path, ".proxy.npz")
+            if self.load_proxy(proxy_path, meta_path):
+                return
+
+            # Arquivo temporário único: um gerador cancelado do mesmo vídeo (que ainda não
+            # terminou) nunca apaga nem trunca o arquivo do gerador atual
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            fd, partial_path = tempfile.mkstemp(suffix=".part", dir=CACHE_DIR)
+            os.close(fd)
+            try:
+                if self.generate(partial_path):
+                    # Publica o arquivo só depois de completo
+                    self.frames.flush()
+                    self.frames = None
+                    os.replace(partial_path, proxy_path)
+                    save_cache(meta_path, interval_ms=self.interval_ms)
+                    self.frames = np.load(proxy_path, mmap_mode="r")
+                    self.ready = True
+            finally:
+                if os.path.exists(partial_path):
+                    self.frames = None
+                    self.frames_ready = 0
+                    os.remove(partial_path)
+        except Exception as e:
+            print(f"Erro ao gerar proxy de navegação: {e}")
+
+    def load_proxy(self, proxy_path, meta_path):
+        """Mapeia o proxy já gerado; um arquivo ilegível (ex.: truncado) é apagado para ser refeito"""
+        data = load_cache(meta_path, "interval_ms")
+        if data is None or not os.path.exists(proxy_path):
+            return False
+        try:
+            frames = np.load(proxy_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"Cache inválido, será refeito: {os.path.basename(proxy_path)} ({e})")
+            try:
+                os.remove(proxy_path)
+            except OSError:
+                pass
+            return False
+        touch_cache(proxy_path)
+        self.interval_ms = float(data["interval_ms"])
+        self.frames = frames
+        self.frames_ready = len(frames)
+        self.ready = True
+        return True
+
+    def proxy_layout(self, fps, total_frames, frame_width, frame_height):
+        """Escolhe (largura, altura, quantidade de frames) dentro do orçamento"""
+        duration_s = total_frames / fps
+        wanted = max(1, int(math.ceil(duration_s * min(fps, self.max_fps))))
+
+        # Prefere manter o FPS do proxy reduzindo a resolução até min_width
+        width = min(self.max_width, frame_width)
+        while True:
+            # Dimensões pares, exigidas pelo filtro de escala do FFmpeg
+            height = max(2, int(frame_height * width / frame_width) // 2 * 2)
+            count = min(wanted, self.budget_bytes // (width * height * 3))
+            if count == wanted or width // 2 < self.min_width:
+                return width, height, max(1, count)
+            width //= 2
+
+    def generate(self, partial_path):
+        """Decodifica o vídeo uma vez, gravando os frames reduzidos no arquivo mapeado"""
+        cap = cv2.VideoCapture(self.file_path)
+        if not cap.isOpened():
+            return False
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if fps <= 0 or total_frames <= 0:
+            cap.release()
+            return False
+
+        width, height, count = self.proxy_layout(fps, total_frames, frame_width, frame_height)
+        self.interval_ms = total_frames * 1000 / fps / count
+        self.frames = np.lib.format.open_memmap(partial_path, mode="w+", dtype=np.uint8,
+                                                shape=(count, height, width, 3))
+
+        if ffmpeg_available():
+            # O FFmpeg reduz FPS e resolução e escreve direto nas páginas do arquivo
+            cap.release()
+            cap = FFmpegPipeCapture(self.file_path, (width, height), 1000 / self.interval_ms,
+                                    resample=True)
+            for i in range(count):
+                if self.cancelled or not cap.read(self.frames[i])[0]:
+                    break
+                self.frames_ready = i + 1
+        else:
+            # Sem FFmpeg: percorre todos os frames, mas só converte os usados no proxy
+            source_frame = 0
+            for i in range(count):
+                wanted_frame = min(int(i * self.interval_ms * fps / 1000), total_frames - 1)
+                while source_frame < wanted_frame and cap.grab():
+                    source_frame += 1
+                if self.cancelled:
+                    break
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                source_frame += 1
+                cv2.resize(frame, (width, height), dst=self.frames[i], interpolation=cv2.INTER_AREA)
+                self.frames_ready = i + 1
+        cap.release()
+
+        # Frames finais que não puderam ser lidos repetem o último válido
+        if 0 < self.frames_ready < count:
+            self.frames[self.frames_ready:] = self.frames[self.frames_ready - 1]
+            if not self.cancelled:
+                self.frames_ready = count
+        return not self.cancelled and self.frames_ready == count
+
+    def frame_at(self, ms):
+        """Retorna o frame do proxy mais próximo do tempo especificado, ou None se ainda não gerado"""
+        frames = self.frames
+        if frames is None:
+            return None
+        index = max(0, min(int(ms / self.interval_ms), len(frames) - 1))
+        if index >= self.frames_ready:
+            return None
+        return frames[index]
@@ -0,0 +1,152 @@
+import os
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+import cv2
+from effects_processor import EffectsProcessor
+from video_index import VideoIndex
+from export_pipeline import ExportPipeline, STAGES
+
+
+def export_segment(input_path, segment_path, effect, start_frame, end_frame, batch_frames,
+                   progress, cancel_event, index):
+    """
+    Executado em um processo separado: decodifica os frames [start_frame, end_frame)
+    (até o fim do vídeo se end_frame for None), aplica o efeito e codifica o trecho,
+    com os estágios sobrepostos. Retorna o tempo ocupado/ocioso de cada estágio.
+    """
+    # Cada processo já ocupa um núcleo; threads internas só disputariam os mesmos núcleos
+    cv2.setNumThreads(1)
+    processor = EffectsProcessor(tiles=1)
+
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"não foi possível abrir {input_path}")
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    out = cv2.VideoWriter(segment_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height), True)
+
+    try:
+        frame_limit = None if end_frame is None else end_frame - start_frame
+        pipeline = ExportPipeline(cap, out, processor, effect, batch_frames, effect_workers=1,
+                                  frame_limit=frame_limit)
+        pipeline.run(cancel_event.is_set, lambda written: progress.__setitem__(index, written))
+        return pipeline.stats
+    finally:
+        cap.release()
+        out.release()
+        processor.shutdown()
+
+
+class SegmentedExport:
+    def __init__(self, input_path, effect, workers, batch_frames=8, min_segment_frames=250):
+        """
+        Exportação paralela: o vídeo é dividido em trechos que começam em keyframes,
+        cada trecho é decodificado, processado e codificado em um processo separado,
+        e os trechos são unidos sem recodificação pelo concat do FFmpeg.
+        """
+        self.input_path = input_path
+        self.effect = effect
+        self.workers = workers
+        self.batch_frames = batch_frames
+        self.min_segment_frames = min_segment_frames  # Trechos menores não compensam um processo
+        # Tempo ocupado/ocioso de cada estágio, somado entre os processos
+        self.stats = {stage: {"busy": 0.0, "idle": 0.0} for stage in STAGES}
+
+    def can_split(self, total_frames):
+        """Indica se o vídeo rende ao menos dois trechos para processar em paralelo"""
+        return self.workers > 1 and total_frames >= 2 * self.min_segment_frames
+
+    def plan_segments(self, total_frames):
+        """Divide os frames em até `workers` trechos [início, fim), com início em keyframes"""
+        count = max(1, min(self.workers, total_frames // self.min_segment_frames))
+        video_index = VideoIndex(self.input_path)
+        video_index.load_or_build()
+
+        starts = [0]
+        for i in range(1, count):
+            start = int(round(i * total_frames / count))
+            # Com o índice, o trecho começa no keyframe anterior: a busca é exata e barata
+            if video_index.ready:
+                start = video_index.keyframe_before(start)
+            if start - starts[-1] >= self.min_segment_frames:
+                starts.append(start)
+        # O último trecho vai até o fim do arquivo, mesmo que a contagem de frames seja estimada
+        return list(zip(starts, starts[1:] + [None]))
+
+    def run(self, output_path, total_frames, is_cancelled, on_progress, audio_source=None):
+        """
+        Gera o vídeo processado em output_path, com o áudio de audio_source (ou sem áudio).
+        on_progress(frames gravados, somados entre os trechos) é chamado a cada meio segundo.
+        Retorna False se a exportação for cancelada; erros dos processos são propagados.
+        """
+        segments = self.plan_segments(total_frames)
+        temp_dir = tempfile.mkdtemp(prefix="export_", dir=os.path.dirname(os.path.abspath(output_path)))
+        # "spawn": os processos não herdam as threads e locks da interface e do engine
+        context = multiprocessing.get_context("spawn")
+        try:
+            with context.Manager() as manager, \
+                    ProcessPoolExecutor(max_workers=len(segments), mp_context=context) as executor:
+                progress = manager.dict()
+                cancel_event = manager.Event()
+                segment_paths = [os.path.join(temp_dir, f"segment_{i:04d}.mp4") for i in range(len(segments))]
+                futures = [executor.submit(export_segment, self.input_path, path, self.effect, start, end,
+                                           self.batch_frames, progress, cancel_event, i)
+                           for i, (path, (start, end)) in enumerate(zip(segment_paths, segments))]
+
+                pending = futures
+                try:
+                    while pending:
+                        done, pending = wait(pending, timeout=0.5, return_when=FIRST_EXCEPTION)
+                        for future in done:
+                            # Propaga o erro de um processo
+                            for stage, times in future.result().items():
+                                for kind, seconds in times.items():
+                                    self.stats[stage][kind] += seconds
+                        if is_cancelled():
+                            cancel_event.set()
+                            return False
+                        on_progress(sum(progress.values()))
+                except BaseException:
+                    # Interrompe os demais trechos: o executor só termina quando todos pararem
+                    cancel_event.set()
+                    raise
+
+            self.concat_segments(segment_paths, output_path, audio_source)
+            return True
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def concat_segments(self, segment_paths, output_path, audio_source=None):
+        """
+        Une os trechos com o concat demuxer do FFmpeg, copiando os pacotes sem recodificar.
+        Com audio_source, o áudio original é mesclado na mesma passada.
+        """
+        list_path = os.path.join(os.path.dirname(segment_paths[0]), "segments.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in segment_paths:
+                escaped = path.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        cmd = [
+            "ffmpeg",
+            "-v", "error",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", list_path
+        ]
+        if audio_source is not None:
+            cmd += ["-i", audio_source, "-map", "0:v:0", "-map", "1:a:0?", "-c:a", "aac", "-shortest"]
+        cmd += [
+            "-c:v", "copy",
+            output_path,
+            "-y"
+        ]
+        process = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if process.returncode != 0:
+            raise RuntimeError(f"falha ao unir os trechos: {process.stderr.decode(errors='replace').strip()}")
@@ -0,0 +1,164 @@
+import os
+import math
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from video_index import VideoIndex, cache_path_for, load_cache, save_cache
+from ffmpeg_pipe import ffmpeg_available
+
+
+class ThumbnailSheet:
+    def __init__(self, file_path, interval_s=10, thumb_width=128, max_thumbnails=400, workers=None):
+        """
+        Folha de miniaturas (sprite sheet) de um vídeo para a pré-visualização do slider.
+        Decodifica uma miniatura a cada interval_s segundos, em paralelo, e guarda
+        todas em um único array (N, H, W, 3) em cache no disco.
+        """
+        self.file_path = file_path
+        self.interval_s = interval_s
+        self.thumb_width = thumb_width
+        self.max_thumbnails = max_thumbnails
+        self.workers = workers or min(4, os.cpu_count() or 1)
+
+        self.thumbnails = None  # Array (N, H, W, 3) com as miniaturas em BGR
+        self.interval_ms = interval_s * 1000
+        self.ready = False
+        self.cancelled = False
+        self.thread = None
+
+    def generate_async(self):
+        """Carrega a folha do cache ou a gera em uma thread separada"""
+        self.thread = threading.Thread(target=self.load_or_generate, daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        """Interrompe a geração (por exemplo, ao abrir outro vídeo)"""
+        self.cancelled = True
+
+    def load_or_generate(self):
+        """Carrega a folha de miniaturas do disco, gerando-a se ainda não existir"""
+        try:
+            sheet_path = cache_path_for(self.file_path, ".thumbs.npz")
+            data = load_cache(sheet_path, "thumbnails", "interval_ms")
+            if data is not None:
+                self.interval_ms = float(data["interval_ms"])
+                self.thumbnails = data["thumbnails"]
+                self.ready = True
+                return
+
+            if self.generate():
+                save_cache(sheet_path, thumbnails=self.thumbnails, interval_ms=self.interval_ms)
+                self.ready = True
+        except Exception as e:
+            print(f"Erro ao gerar miniaturas: {e}")
+
+    def generate(self):
+        """Decodifica as miniaturas em paralelo, cada worker com seu próprio cap"""
+        cap = cv2.VideoCapture(self.file_path)
+        if not cap.isOpened():
+            return False
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.release()
+        if fps <= 0 or total_frames <= 0:
+            return False
+
+        # Limita a quantidade de miniaturas em vídeos longos aumentando o intervalo
+        duration_ms = total_frames * 1000 / fps
+        self.interval_ms = max(self.interval_s * 1000, duration_ms / self.max_thumbnails)
+        count = max(1, int(math.ceil(duration_ms / self.interval_ms)))
+
+        thumb_height = max(1, int(frame_height * self.thumb_width / frame_width))
+        thumbnails = np.zeros((count, thumb_height, self.thumb_width, 3), dtype=np.uint8)
+
+        # Com o índice, cada miniatura usa o keyframe anterior ao seu instante, e uma passada
+        # do FFmpeg decodifica só os keyframes (a busca do OpenCV decodificaria o GOP anterior)
+        video_index = VideoIndex(self.file_path)
+        video_index.load_or_build()
+        if video_index.ready and ffmpeg_available():
+            wanted = {}
+            for i in range(count):
+                frame_index = min(int(i * self.interval_ms * fps / 1000), total_frames - 1)
+                wanted.setdefault(video_index.keyframe_position(frame_index), []).append(i)
+            if not self.decode_keyframes(wanted, thumb_height, thumbnails):
+                return False
+            self.thumbnails = thumbnails
+            return True
+
+        def decode_range(indices):
+            worker_cap = cv2.VideoCapture(self.file_path)
+            try:
+                for i in indices:
+                    if self.cancelled:
+                        return
+                    frame_index = min(int(i * self.interval_ms * fps / 1000), total_frames - 1)
+                    worker_cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                    ret, frame = worker_cap.read()
+                    if ret:
+                        cv2.resize(frame, (self.thumb_width, thumb_height), dst=thumbnails[i],
+                                   interpolation=cv2.INTER_AREA)
+            finally:
+                worker_cap.release()
+
+        # Cada worker decodifica um trecho contíguo, evitando buscas para trás
+        chunk = int(math.ceil(count / self.workers))
+        ranges = [range(start, min(start + chunk, count)) for start in range(0, count, chunk)]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(decode_range, ranges))
+
+        if self.cancelled:
+            return False
+        self.thumbnails = thumbnails
+        return True
+
+    def decode_keyframes(self, wanted, thumb_height, thumbnails):
+        """
+        Decodifica apenas os keyframes (-skip_frame nokey), já reduzidos ao tamanho das
+        miniaturas, em uma única passada do FFmpeg pelo arquivo.
+        wanted: posição na lista de keyframes -> miniaturas que usam esse keyframe
+        """
+        cmd = [
+            "ffmpeg",
+            "-v", "error",
+            "-nostdin",
+            "-skip_frame", "nokey",
+            "-i", self.file_path,
+            "-an", "-sn",
+            "-vsync", "0",
+            "-vf", f"scale={self.thumb_width}:{thumb_height}:flags=area",
+            "-f", "rawvideo",
+            "-pix_fmt", "bgr24",
+            "-"
+        ]
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        frame = np.empty((thumb_height, self.thumb_width, 3), dtype=np.uint8)
+        view = memoryview(frame).cast("B")
+        try:
+            for position in range(max(wanted) + 1):
+                if self.cancelled:
+                    return False
+                filled = 0
+                while filled < len(view):
+                    count = process.stdout.readinto(view[filled:])
+                    if not count:
+                        # Menos keyframes que no índice: as miniaturas restantes ficam pretas
+                        return True
+                    filled += count
+                for i in wanted.get(position, ()):
+                    thumbnails[i] = frame
+            return True
+        finally:
+            process.kill()
+            process.stdout.close()
+            process.wait()
+
+    def thumbnail_at(self, ms):
+        """Retorna a miniatura mais próxima do tempo especificado, ou None se não estiver pronta"""
+        if not self.ready or self.thumbnails is None or len(self.thumbnails) == 0:
+            return None
+        index = int(round(ms / self.interval_ms))
+        return self.thumbnails[max(0, min(index, len(self.thumbnails) - 1))]
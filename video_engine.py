@@ -1,15 +1,23 @@
 import cv2
 import time
+import threading
+from collections import OrderedDict
 import numpy as np
+from video_index import VideoIndex
+from ffmpeg_pipe import FFmpegPipeCapture, ffmpeg_available
 
 class VideoEngine:
-    def __init__(self, effects_processor):
+    def __init__(self, effects_processor, buffer_budget_mb=256, output_format="bgr"):
         self.effects_processor = effects_processor
+        self.output_format = output_format  # Formato entregue: "bgr" ou "rgb" (pronto para exibição)
         
         # Parâmetros de vídeo
         self.fps = 0
         self.total_frames = 0
         self.cap = None
+        self.decode_backend = "opencv"  # "opencv" ou "ffmpeg" (redimensiona na decodificação)
+        self.ffmpeg_scale_threshold = 4  # No modo "auto", usa FFmpeg a partir desta redução de área
+        self.video_index = None  # Índice de keyframes/pts usado nas buscas
         self.current_frame = 0
         self.video_length = 0  # em milissegundos
         
@@ -18,10 +26,35 @@ class VideoEngine:
         self.start_time = None
         self.paused_elapsed = 0
         
-        # Para buffer de frames
-        self.frame_buffer = []
-        self.buffer_start_frame = 0
-        self.frames_per_batch = 24
+        # Para buffer de frames (preenchido pela thread de decodificação)
+        self.frame_batches = OrderedDict()  # Cache LRU: início do lote -> (slot, frames percorridos)
+        self.frames_per_batch = 24  # Recalculado a partir do orçamento de memória
+        self.max_frames_per_batch = 30  # Limite do lote para buscas e reinícios rápidos
+        self.prefetch_batches = 3  # Lotes mantidos à frente da posição de reprodução
+        self.effect_batch_frames = 8  # Frames decodificados por chamada de efeito em lote
+        self.buffer_budget_bytes = buffer_budget_mb * 1024 * 1024  # Teto de memória do buffer
+        self.cache_slots = self.prefetch_batches
+        self.cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self.last_lookup_batch = None
+        self.last_frame = None
+        
+        # Buffer circular pré-alocado (N, H, W, C): cada slot guarda um lote inteiro
+        self.frame_store = None  # Frames decodificados e redimensionados, sem efeito
+        self.effect_store = None  # Frames com efeito, calculados sob demanda
+        self.effect_tags = []  # Efeito presente em cada posição de effect_store
+        self.stored_frames = None  # Índice do frame guardado em cada posição (-1 se vazia)
+        self.decode_frame = None  # Frame decodificado reaproveitado pelo cap.read
+        
+        # Thread produtora que decodifica à frente da posição de reprodução
+        self.buffer_lock = threading.Condition()
+        self.decode_thread = None
+        self.decode_running = False
+        self.target_frame = 0  # Frame que a thread de decodificação deve alcançar
+        self.next_decode_frame = 0  # Próximo frame que o cap irá ler
+        
+        # Recuperação de atraso: frames pulados com grab() em vez de decodificados
+        self.max_catchup_grabs = 60  # Sem índice, avança até isso com grab() em vez de buscar
+        self.dropped_frames = 0  # Frames que a reprodução pulou por atraso
         
         # Para monitoramento de FPS
         self.current_fps = 0
@@ -35,12 +68,12 @@ class VideoEngine:
         # Dimensões do vídeo
         self.container_width = 640
         self.container_height = 360
+        self.frame_size = (640, 360)
 
-    def load_video_stream(self, file_path, width=640, height=360):
-        """Carrega um fluxo de vídeo a partir de um arquivo"""
-        # Libera cap antigo, se existir
-        if self.cap is not None:
-            self.cap.release()
+    def load_video_stream(self, file_path, width=640, height=360, backend="auto"):
+        """Carrega um fluxo de vídeo a partir de um arquivo (backend: "auto", "opencv" ou "ffmpeg")"""
+        # Encerra a thread de decodificação e libera cap antigo, se existir
+        self.release()
         
         # Atualiza dimensões do container
         self.container_width = width or 640
@@ -57,102 +90,463 @@ class VideoEngine:
         self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
         self.current_frame = 0
         
+        # Carrega (ou constrói em segundo plano) o índice de keyframes do arquivo
+        self.video_index = VideoIndex(file_path)
+        self.video_index.load_async()
+        
+        # Calcula uma única vez o tamanho de exibição mantendo a proporção
+        frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        scale = min(self.container_width / frame_width, self.container_height / frame_height)
+        self.frame_size = (int(frame_width * scale), int(frame_height * scale))
+        
+        # Fontes grandes são decodificadas pelo FFmpeg já no tamanho de exibição
+        self.decode_backend = self.choose_backend(backend, scale)
+        if self.decode_backend == "ffmpeg":
+            self.cap.release()
+            self.cap = FFmpegPipeCapture(file_path, self.frame_size, self.fps)
+        
         # Inicializa o buffer de frames
-        self.frame_buffer = []
-        self.buffer_start_frame = 0
-        self.frames_per_batch = int(self.fps) if self.fps else 30  # Um segundo de frames
+        self.frame_batches = OrderedDict()
+        self.cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self.last_lookup_batch = None
+        self.last_frame = None
+        self.target_frame = 0
+        self.next_decode_frame = 0
+        self.dropped_frames = 0
+        self.allocate_frame_store(frame_width, frame_height)
         
-        # Carregar o primeiro lote de frames
-        self.load_frame_batch(0)
+        # Inicia a thread que decodifica os lotes à frente da reprodução
+        self.decode_running = True
+        self.decode_thread = threading.Thread(target=self.decode_loop, daemon=True)
+        self.decode_thread.start()
         
         # Redefinir o controle de tempo
         self.reset_fps_counter()
 
-    def load_frame_batch(self, start_frame):
-        """Carrega um lote de frames a partir do índice especificado"""
-        if self.cap is None or not self.cap.isOpened():
-            return
+    def choose_backend(self, backend, scale):
+        """Escolhe o backend de decodificação para o arquivo"""
+        if backend == "auto":
+            # Só compensa o processo externo quando a redução de resolução é grande
+            if ffmpeg_available() and scale * scale * self.ffmpeg_scale_threshold <= 1:
+                return "ffmpeg"
+            return "opencv"
+        if backend == "ffmpeg" and not ffmpeg_available():
+            print("FFmpeg não encontrado: usando decodificação do OpenCV.")
+            return "opencv"
+        return backend
+
+    def allocate_frame_store(self, frame_width, frame_height):
+        """Pré-aloca o buffer circular de frames e o frame de decodificação dentro do orçamento"""
+        width, height = self.frame_size
         
-        # Limpa o buffer atual
-        self.frame_buffer.clear()
+        # O frame em tamanho original do OpenCV também conta no orçamento
+        decode_bytes = frame_width * frame_height * 3 if self.decode_backend == "opencv" else 0
         
-        # Define a posição inicial para o lote
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-        self.buffer_start_frame = start_frame
+        # Quantos frames cabem no orçamento (cada um guardado sem e com efeito),
+        # independente do FPS do vídeo
+        frame_bytes = 2 * width * height * 3
+        capacity = max(0, self.buffer_budget_bytes - decode_bytes) // frame_bytes
         
-        # Obtém dimensões uma única vez fora do loop
-        frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # Lotes pequenos o bastante para caber a janela de pré-carregamento e mais um
+        min_slots = self.prefetch_batches + 1
+        self.frames_per_batch = max(1, min(self.max_frames_per_batch, capacity // min_slots))
+        self.cache_slots = max(min_slots, capacity // self.frames_per_batch)
+        store_shape = (self.cache_slots * self.frames_per_batch, height, width, 3)
         
-        # Calcula a escala para manter a proporção
-        scale = min(self.container_width / frame_width, self.container_height / frame_height)
-        new_width = int(frame_width * scale)
-        new_height = int(frame_height * scale)
+        # Reaproveita os arrays quando as dimensões não mudaram
+        if self.frame_store is None or self.frame_store.shape != store_shape:
+            self.frame_store = np.empty(store_shape, dtype=np.uint8)
+            self.effect_store = np.empty(store_shape, dtype=np.uint8)
+        self.effect_tags = [None] * store_shape[0]
+        self.stored_frames = np.full(store_shape[0], -1, dtype=np.int64)
         
-        # Use um número fixo e razoável de frames por lote
-        frames_to_load = min(self.frames_per_batch, self.total_frames - start_frame)
+        # O backend FFmpeg lê direto nos slots; só o OpenCV precisa do frame em tamanho original
+        if self.decode_backend == "ffmpeg":
+            self.decode_frame = None
+        elif self.decode_frame is None or self.decode_frame.shape != (frame_height, frame_width, 3):
+            self.decode_frame = np.empty((frame_height, frame_width, 3), dtype=np.uint8)
+
+    def buffer_memory(self):
+        """Retorna (bytes em uso, bytes alocados) pelo buffer de frames"""
+        if self.frame_store is None:
+            return 0, 0
+        allocated = self.frame_store.nbytes + self.effect_store.nbytes
+        if self.decode_frame is not None:
+            allocated += self.decode_frame.nbytes
+        batch_bytes = 2 * self.frames_per_batch * self.frame_store[0].nbytes
+        used = min(allocated, len(self.frame_batches) * batch_bytes)
+        return used, allocated
+
+    def release(self):
+        """Encerra a thread de decodificação e libera o vídeo aberto"""
+        with self.buffer_lock:
+            self.decode_running = False
+            self.buffer_lock.notify_all()
         
-        for _ in range(frames_to_load):
-            ret, frame = self.cap.read()
-            if not ret:
+        # Espera a thread terminar de fato: uma thread ainda ativa (ex.: parada em uma
+        # busca demorada) continuaria lendo o novo cap e gravando nos novos buffers
+        if self.decode_thread is not None and self.decode_thread is not threading.current_thread():
+            self.decode_thread.join()
+        self.decode_thread = None
+        
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def decode_loop(self):
+        """Laço da thread produtora: mantém os próximos lotes decodificados"""
+        while True:
+            with self.buffer_lock:
+                start_frame = self.next_batch_to_decode()
+                while self.decode_running and start_frame is None:
+                    self.buffer_lock.wait()
+                    start_frame = self.next_batch_to_decode()
+                if not self.decode_running:
+                    return
+                
+                batch = self.frame_batches.get(start_frame)
+                if batch is not None and not self.must_restart_batch(start_frame, batch):
+                    # Lote interrompido: continua de onde parou
+                    slot, end_offset = batch
+                else:
+                    # Lote novo (ou que precisa recomeçar, reaproveitando o próprio slot)
+                    slot = batch[0] if batch is not None else self.free_slot()
+                    end_offset = self.first_frame_to_decode(start_frame) - start_frame
+                    slot_start = slot * self.frames_per_batch
+                    self.stored_frames[slot_start:slot_start + self.frames_per_batch] = -1
+                
+                # Publica o lote já vazio; os frames ficam visíveis conforme são decodificados
+                self.frame_batches[start_frame] = (slot, end_offset)
+                self.frame_batches.move_to_end(start_frame)
+            
+            self.load_frame_batch(start_frame, slot, end_offset, self.current_effect)
+
+    def next_batch_to_decode(self):
+        """Retorna o início do próximo lote que falta no buffer (chamado com o lock)"""
+        if self.total_frames <= 0:
+            return None
+        
+        base = self.target_frame - self.target_frame % self.frames_per_batch
+        for i in range(self.prefetch_batches):
+            start_frame = base + i * self.frames_per_batch
+            if start_frame >= self.total_frames:
                 break
+            batch = self.frame_batches.get(start_frame)
+            if batch is None or batch[1] < self.batch_length(start_frame):
+                return start_frame
+            if self.must_restart_batch(start_frame, batch):
+                return start_frame
+        return None
+
+    def must_restart_batch(self, start_frame, batch):
+        """Indica se o frame alvo ficou para trás no lote sem ter sido decodificado (chamado com o lock)"""
+        slot, end_offset = batch
+        offset = self.target_frame - start_frame
+        if not 0 <= offset < end_offset:
+            return False
+        if self.stored_frames[slot * self.frames_per_batch + offset] == self.target_frame:
+            return False
+        
+        # Durante a reprodução, frames pulados por atraso não são recuperados;
+        # só uma busca (frame atual == alvo) ou a pausa exigem o frame exato
+        return not self.playing or self.current_frame == self.target_frame
+
+    def batch_length(self, start_frame):
+        """Número de frames esperado para o lote que começa em start_frame"""
+        return min(self.frames_per_batch, self.total_frames - start_frame)
+
+    def batch_in_window(self, start_frame):
+        """Indica se o lote está na janela de pré-carregamento atual"""
+        base = self.target_frame - self.target_frame % self.frames_per_batch
+        return base <= start_frame < base + self.prefetch_batches * self.frames_per_batch
+
+    def first_frame_to_decode(self, start_frame):
+        """Decide a partir de qual frame do lote vale a pena decodificar (chamado com o lock)"""
+        # Frames do lote anteriores ao alvo não serão exibidos agora: começa pelo alvo
+        if start_frame <= self.target_frame < start_frame + self.frames_per_batch:
+            return self.target_frame
+        return start_frame
+
+    def free_slot(self):
+        """Retorna um slot livre, descartando o lote menos usado se preciso (chamado com o lock)"""
+        used_slots = {slot for slot, _ in self.frame_batches.values()}
+        for slot in range(self.cache_slots):
+            if slot not in used_slots:
+                return slot
+        
+        # Cache cheio: descarta o lote menos recente fora da janela de pré-carregamento
+        for start_frame, (slot, _) in self.frame_batches.items():
+            if not self.batch_in_window(start_frame):
+                del self.frame_batches[start_frame]
+                self.cache_stats["evictions"] += 1
+                return slot
+        return None
+
+    def lookup_batch(self, frame_index):
+        """Consulta o cache pelo lote do frame, atualizando a ordem LRU e os contadores"""
+        start_frame = frame_index - frame_index % self.frames_per_batch
+        with self.buffer_lock:
+            batch = self.frame_batches.get(start_frame)
+            if batch is not None:
+                self.frame_batches.move_to_end(start_frame)
             
-            # Redimensiona antes de aplicar efeito (mais eficiente)
-            resized = cv2.resize(frame, (new_width, new_height))
+            # Contabiliza uma vez por lote visitado, não a cada frame exibido
+            if start_frame != self.last_lookup_batch:
+                self.cache_stats["hits" if batch is not None else "misses"] += 1
+                self.last_lookup_batch = start_frame
+        return batch
+
+    def load_frame_batch(self, start_frame, slot, end_offset, effect):
+        """Decodifica os frames que faltam do lote para o slot indicado do buffer circular"""
+        if self.cap is None or not self.cap.isOpened():
+            return
+        
+        # Só reposiciona o cap quando a leitura não é sequencial
+        if start_frame + end_offset != self.next_decode_frame:
+            self.position_capture(start_frame + end_offset)
+        
+        slot_start = slot * self.frames_per_batch
+        batch_length = self.batch_length(start_frame)
+        pending = end_offset  # Primeiro frame decodificado ainda sem efeito/publicação
+        for i in range(end_offset, batch_length):
+            # Interrompe o lote se a reprodução saltou para longe dele (busca ou atraso)
+            if not self.decode_running or not self.batch_in_window(start_frame):
+                return
+            
+            frame_index = start_frame + i
+            late = self.playing and frame_index < self.target_frame
+            if late:
+                # Atrasado: o frame já passou e seria descartado, então só avança
+                # com grab(), sem retrieve/conversão de cor, redimensionamento ou efeito
+                ret = self.cap.grab()
+            elif self.decode_backend == "ffmpeg":
+                # O FFmpeg já entrega o frame redimensionado: lê direto no slot
+                ret, frame = self.cap.read(self.frame_store[slot_start + i])
+            else:
+                # Decodifica sempre no mesmo array, sem alocar um frame novo
+                ret, frame = self.cap.read(self.decode_frame)
+            
+            if not ret:
+                # Fim real do vídeo (a contagem do contêiner pode ser maior)
+                self.publish_frames(start_frame, slot, pending, i, i, effect)
+                with self.buffer_lock:
+                    self.total_frames = frame_index
+                    self.buffer_lock.notify_all()
+                self.next_decode_frame = -1
+                return
+            self.next_decode_frame += 1
+            
+            if late:
+                # Publica o que estava pendente e registra o frame pulado
+                self.publish_frames(start_frame, slot, pending, i, i + 1, effect)
+                pending = i + 1
+                continue
             
-            # Aplica o efeito selecionado
-            processed_frame = self.effects_processor.apply_effect_to_frame(resized, self.current_effect)
+            # Redimensiona antes de aplicar efeito (mais eficiente) direto no slot
+            if self.decode_backend == "opencv":
+                cv2.resize(frame, self.frame_size, dst=self.frame_store[slot_start + i])
             
-            self.frame_buffer.append(processed_frame)
+            # O efeito é aplicado a grupos de frames de uma vez, exceto quando o
+            # frame já é esperado pela reprodução (ou o lote acabou)
+            if (i + 1 - pending >= self.effect_batch_frames or frame_index <= self.target_frame + 1
+                    or i + 1 == batch_length):
+                self.publish_frames(start_frame, slot, pending, i + 1, i + 1, effect)
+                pending = i + 1
+
+    def publish_frames(self, start_frame, slot, first, end, walked, effect):
+        """Aplica o efeito em lote aos frames [first, end) do slot e publica o lote até walked"""
+        if end > first:
+            slot_start = slot * self.frames_per_batch
+            a, b = slot_start + first, slot_start + end
+            
+            # Já adianta o efeito atual; uma troca de efeito não exige nova decodificação.
+            # Um efeito ainda em pré-cálculo fica para a exibição, sem atrasar a decodificação
+            if not self.effect_ready(effect):
+                effect = "none"
+            if effect == "none" and self.output_format == "bgr":
+                self.effect_tags[a:b] = [None] * (b - a)
+            else:
+                self.effects_processor.apply_effect_to_batch(self.frame_store[a:b], effect,
+                                                             out=self.effect_store[a:b],
+                                                             output_format=self.output_format)
+                self.effect_tags[a:b] = [effect] * (b - a)
+            self.stored_frames[a:b] = np.arange(start_frame + first, start_frame + end)
+        
+        # Publica os frames assim que ficam prontos
+        with self.buffer_lock:
+            self.frame_batches[start_frame] = (slot, walked)
+            self.buffer_lock.notify_all()
+
+    def position_capture(self, frame_index):
+        """Posiciona o cap no frame usando o frame-chave mais próximo do índice"""
+        frames_ahead = frame_index - self.next_decode_frame
+        if self.decode_backend == "ffmpeg":
+            # A busca do FFmpeg já parte do keyframe e é exata; só avança se estiver perto
+            if not 0 <= frames_ahead <= self.max_catchup_grabs:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                self.next_decode_frame = frame_index
+        elif self.video_index is not None and self.video_index.ready:
+            # Se o cap já está no mesmo GOP, antes do frame, basta avançar sem buscar.
+            # Senão busca direto o frame: o OpenCV já parte do keyframe adequado, e buscar o
+            # keyframe faria ele decodificar o GOP anterior antes de avançar por este
+            keyframe = self.video_index.keyframe_before(frame_index)
+            if not keyframe <= self.next_decode_frame <= frame_index:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                self.next_decode_frame = frame_index
+        elif not 0 <= frames_ahead <= self.max_catchup_grabs:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            self.next_decode_frame = frame_index
+        
+        # Avança com grab() (sem conversão de cor) até o frame desejado
+        while self.next_decode_frame < frame_index and self.decode_running:
+            if not self.cap.grab():
+                self.next_decode_frame = -1
+                break
+            self.next_decode_frame += 1
 
-    def reload_frame_buffer(self):
-        """Recarrega o buffer de frames atual com o novo efeito"""
-        self.load_frame_batch(self.buffer_start_frame)
+    def frame_for_time(self, ms):
+        """Converte um tempo em milissegundos no índice do frame correspondente"""
+        if self.video_index is not None and self.video_index.ready:
+            return self.video_index.frame_for_time(ms)
+        return int(ms * self.fps / 1000)
+
+    def apply_effect_at(self, position, effect):
+        """Aplica o efeito ao frame decodificado na posição, memorizando o resultado"""
+        raw_frame = self.frame_store[position]
+        if effect == "none" and self.output_format == "bgr":
+            return raw_frame
+        
+        target = self.effect_store[position]
+        if self.effect_tags[position] == effect:
+            return target
+        
+        if not self.effect_ready(effect):
+            # Efeito ainda em pré-cálculo (ex.: LUT 3D): mostra o frame como estiver
+            # (com o efeito anterior ou sem efeito) em vez de esperar pela compilação
+            if self.effect_tags[position] is not None:
+                return target
+            if self.output_format == "bgr":
+                return raw_frame
+            effect = "none"
+        
+        # O efeito grava direto no slot correspondente de effect_store, sem alocar
+        self.effects_processor.apply_effect_to_frame(raw_frame, effect, out=target,
+                                                     output_format=self.output_format)
+        self.effect_tags[position] = effect
+        return target
+
+    def effect_ready(self, effect):
+        """Indica se o efeito já pode ser aplicado sem pré-cálculos, começando-os em segundo plano se não"""
+        if effect == "none" or self.effects_processor.chain_ready(effect, output_format=self.output_format):
+            return True
+        self.effects_processor.prepare_chain(effect, output_format=self.output_format)
+        return False
 
     def set_effect(self, effect):
-        """Define o efeito a ser aplicado"""
+        """Define o efeito a ser aplicado, já começando seus pré-cálculos em segundo plano"""
         self.current_effect = effect
+        self.effects_processor.prepare_chain(effect, output_format=self.output_format)
+
+    def set_target_frame(self, frame_index):
+        """Informa à thread de decodificação a nova posição de reprodução"""
+        with self.buffer_lock:
+            if frame_index != self.target_frame:
+                self.target_frame = frame_index
+                self.buffer_lock.notify_all()
+
+    def get_buffered_frame(self, frame_index):
+        """Retorna o frame se ele já estiver decodificado, sem bloquear"""
+        batch = self.lookup_batch(frame_index)
+        return self.frame_from_batch(batch, frame_index)
+
+    def frame_from_batch(self, batch, frame_index):
+        """Retorna o frame com o efeito atual, ou None se o lote não o contém"""
+        if batch is None:
+            return None
+        position = batch[0] * self.frames_per_batch + frame_index % self.frames_per_batch
+        if self.stored_frames[position] != frame_index:
+            return None
+        return self.apply_effect_at(position, self.current_effect)
+
+    def latest_ready_frame(self, frame_index):
+        """Procura o frame pronto mais recente entre o atual e frame_index (recuperação de atraso)"""
+        start_frame = frame_index - frame_index % self.frames_per_batch
+        with self.buffer_lock:
+            batch = self.frame_batches.get(start_frame)
+        if batch is None:
+            return None, None
+        
+        for candidate in range(frame_index - 1, max(self.current_frame, start_frame - 1), -1):
+            frame = self.frame_from_batch(batch, candidate)
+            if frame is not None:
+                return candidate, frame
+        return None, None
 
     def get_next_frame(self):
         """Obtém o próximo frame a ser exibido"""
         if not self.playing or self.cap is None:
             return None
-
+        
         # Calcula o tempo decorrido e o frame correspondente
         elapsed_ms = self.get_elapsed_time()
-        desired_frame = int(elapsed_ms * self.fps / 1000)
-
+        desired_frame = self.frame_for_time(elapsed_ms)
+        
         # Verifica se chegou ao fim do vídeo
         if desired_frame >= self.total_frames:
             return None
-
-        # Verifica se o frame está no buffer
-        if desired_frame < self.buffer_start_frame or desired_frame >= self.buffer_start_frame + len(self.frame_buffer):
-            # Carregar um novo lote
-            batch_start = desired_frame
-            # Tentar ir um pouco para trás para suavizar a transição
-            batch_start = max(0, batch_start - 5)
-            self.load_frame_batch(batch_start)
-        
-        # Obtém o frame do buffer
-        buffer_index = desired_frame - self.buffer_start_frame
-        if 0 <= buffer_index < len(self.frame_buffer):
-            # Atualiza o frame atual
-            self.current_frame = desired_frame
-            
-            # Atualiza o contador de FPS
-            self.frames_count += 1
-            current_time = time.time()
-            time_diff = current_time - self.last_frame_time
-            
-            if time_diff >= self.fps_update_interval:
-                self.current_fps = self.frames_count / time_diff
-                self.frames_count = 0
-                self.last_frame_time = current_time
-                
-            # Retorna o frame para exibição
-            return self.frame_buffer[buffer_index]
         
+        # Avança a janela de pré-carregamento e consome apenas frames prontos
+        self.set_target_frame(desired_frame)
+        frame = self.get_buffered_frame(desired_frame)
+        
+        if frame is None:
+            # Atrasado: exibe o frame pronto mais recente em vez de esperar pelo desejado
+            desired_frame, frame = self.latest_ready_frame(desired_frame)
+            if frame is None:
+                # Nada novo decodificado: mantém o último frame exibido (None se não houver)
+                return self.last_frame
+        
+        # Contabiliza os frames que a reprodução pulou por estar atrasada
+        if desired_frame > self.current_frame + 1:
+            self.dropped_frames += desired_frame - self.current_frame - 1
+        
+        # Atualiza o frame atual
+        self.current_frame = desired_frame
+        self.last_frame = frame
+        
+        # Atualiza o contador de FPS
+        self.frames_count += 1
+        current_time = time.time()
+        time_diff = current_time - self.last_frame_time
+        
+        if time_diff >= self.fps_update_interval:
+            self.current_fps = self.frames_count / time_diff
+            self.frames_count = 0
+            self.last_frame_time = current_time
+        
+        # Retorna o frame para exibição
+        return frame
+
+    def reached_end(self):
+        """Indica se o tempo de reprodução já passou do último frame"""
+        return self.frame_for_time(self.get_elapsed_time()) >= self.total_frames
+
+    def wait_for_frame(self, frame_index, timeout=1.0):
+        """Aguarda a thread de decodificação produzir o frame (fora da reprodução contínua)"""
+        deadline = time.time() + timeout
+        with self.buffer_lock:
+            while self.decode_running:
+                start_frame = frame_index - frame_index % self.frames_per_batch
+                frame = self.frame_from_batch(self.frame_batches.get(start_frame), frame_index)
+                if frame is not None:
+                    return frame
+                if frame_index >= self.total_frames:
+                    return None
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.buffer_lock.wait(remaining)
         return None
 
     def get_current_frame(self):
@@ -161,19 +555,15 @@ class VideoEngine:
             return None
         
         # Verifica se o frame está no buffer
-        buffer_index = self.current_frame - self.buffer_start_frame
-        if 0 <= buffer_index < len(self.frame_buffer):
-            return self.frame_buffer[buffer_index]
-        
-        # Se não estiver no buffer, carrega o lote correto
-        self.load_frame_batch(max(0, self.current_frame - 5))
+        self.set_target_frame(self.current_frame)
+        frame = self.get_buffered_frame(self.current_frame)
+        if frame is None:
+            # Se não estiver no buffer, aguarda a thread carregar o lote correto
+            frame = self.wait_for_frame(self.current_frame)
         
-        # Tenta novamente
-        buffer_index = self.current_frame - self.buffer_start_frame
-        if 0 <= buffer_index < len(self.frame_buffer):
-            return self.frame_buffer[buffer_index]
-        
-        return None
+        if frame is not None:
+            self.last_frame = frame
+        return frame
 
     def start_playback(self):
         """Inicia a reprodução do vídeo"""
@@ -199,6 +589,8 @@ class VideoEngine:
         self.playing = False
         self.current_frame = 0
         self.paused_elapsed = 0
+        self.last_frame = None
+        self.set_target_frame(0)
         self.reset_fps_counter()
 
     def seek_to_time(self, ms):
@@ -207,14 +599,15 @@ class VideoEngine:
             return
         
         # Calcula o frame correspondente ao tempo
-        frame_index = int(ms * self.fps / 1000)
+        frame_index = self.frame_for_time(ms)
         frame_index = max(0, min(frame_index, self.total_frames - 1))
         
         # Atualiza o frame atual
         self.current_frame = frame_index
         
-        # Carrega o lote correto de frames
-        self.load_frame_batch(max(0, frame_index - 5))
+        # A thread de decodificação passa a carregar o lote correto, se ele não estiver em cache
+        self.set_target_frame(frame_index)
+        self.last_frame = self.get_buffered_frame(frame_index)
         
         # Atualiza o tempo de pausa
         self.paused_elapsed = ms
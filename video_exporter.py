@@ -8,26 +8,51 @@ import tempfile
 import vlc
 import tkinter as tk
 from tkinter import ttk
+from ffmpeg_pipe import ffmpeg_available, FFmpegPipeWriter
+from segment_export import SegmentedExport
+from export_pipeline import ExportPipeline, stage_report
+from progress_channel import ProgressChannel, format_progress
+
+PIPELINE_BUDGET_BYTES = 128 * 1024 * 1024  # Limite padrão dos buffers de um ExportPipeline
+CODEC_FRAMES = 16  # Frames mantidos internamente pelo decodificador e pelo codificador
+
+
+def physical_memory():
+    """Memória física total em bytes, ou None se o sistema não informar"""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
 
 class VideoExporter:
-    def __init__(self, video_player):
+    def __init__(self, video_player, workers=0, max_jobs=0, memory_budget_mb=0):
         """
         Classe responsável por gerenciar a exportação de vídeos com efeitos.
         Recebe uma referência à instância de VideoPlayer para acessar variáveis e a interface.
+        Com mais de um worker (0 = um por núcleo) e o FFmpeg disponível, o vídeo é
+        exportado em trechos processados em paralelo por processos separados.
+        Até max_jobs itens da fila (0 = um por núcleo) são exportados ao mesmo tempo,
+        desde que a memória estimada deles caiba em memory_budget_mb (0 = metade da RAM).
         """
         self.video_player = video_player
         self.root = video_player.root
         self.export_queue = []
-        self.current_export = None
-        self.export_thread = None
-        self.is_exporting = False
+        self.active_exports = []  # Itens da fila em exportação, na ordem em que começaram
+        self.batch_frames = 8  # Frames processados por chamada de efeito
+        self.workers = workers or os.cpu_count() or 1
+        self.max_jobs = max_jobs or self.workers
+        if memory_budget_mb:
+            self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        else:
+            self.memory_budget_bytes = (physical_memory() or 4 * 1024 ** 3) // 2
 
     def queue_video_export(self):
         """Adiciona o vídeo atual à fila de exportação"""
         if not self.video_player.current_file:
             return
 
-        effect = self.video_player.effect_var.get()
+        effect = self.video_player.current_effect
         if effect == "none":
             return
 
@@ -38,15 +63,22 @@ class VideoExporter:
 
         original_filename = os.path.basename(self.video_player.current_file)
         filename_without_ext, extension = os.path.splitext(original_filename)
-        output_filename = f"{effect}_{filename_without_ext}{extension}"
+        effect_label = self.video_player.effects_processor.effect_label(effect)
+        output_filename = f"{effect_label}_{filename_without_ext}{extension}"
         output_path = os.path.join(videos_dir, output_filename)
         temp_output_path = os.path.join(videos_dir, f"temp_{output_filename}")
 
         # Evita duplicidade na fila
         for item in self.export_queue:
             if item["output_path"] == output_path:
+                print(f"Exportação já está na fila: {output_filename}")
                 return
 
+        # O tamanho do frame define a memória estimada da exportação
+        cap = cv2.VideoCapture(self.video_player.current_file)
+        frame_bytes = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) * int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) * 3
+        cap.release()
+
         export_item = {
             "input_path": self.video_player.current_file,
             "output_path": output_path,
@@ -56,7 +88,11 @@ class VideoExporter:
             "progress_bar": None,
             "cancel_button": None,
             "status_label": None,
-            "cancelled": False
+            "cancelled": False,
+            "frame_bytes": frame_bytes,
+            "processes": 1,
+            "memory_bytes": 0,
+            "thread": None
         }
 
         self.export_queue.append(export_item)
@@ -65,8 +101,7 @@ class VideoExporter:
         # Ativa o botão para cancelar todas as exportações
         self.video_player.btn_cancel_all.config(state=tk.NORMAL)
 
-        if not self.is_exporting:
-            self.process_next_export()
+        self.process_next_export()
 
     def add_export_item_to_ui(self, export_item):
         """Adiciona um item de exportação à interface do usuário"""
@@ -74,7 +109,7 @@ class VideoExporter:
         item_frame.pack(fill=tk.X, pady=2)
 
         filename = os.path.basename(export_item["input_path"])
-        effect_name = export_item["effect"]
+        effect_name = self.video_player.effects_processor.effect_label(export_item["effect"])
 
         info_label = tk.Label(item_frame, text=f"{filename} - Efeito: {effect_name}",
                               bg="#363636", fg="white", anchor="w")
@@ -96,24 +131,54 @@ class VideoExporter:
         export_item["cancel_button"] = cancel_button
         export_item["status_label"] = status_label
 
+    def estimate_job_memory(self, export_item, processes):
+        """Memória estimada de uma exportação: buffers do pipeline e dos codecs em cada processo"""
+        frame_bytes = export_item["frame_bytes"]
+        # Cada pipeline usa até 6 lotes (2 threads de efeito + 2 na fila + leitura e gravação)
+        slots = min(PIPELINE_BUDGET_BYTES, 6 * self.batch_frames * frame_bytes)
+        return processes * (slots + CODEC_FRAMES * frame_bytes)
+
     def process_next_export(self):
-        """Processa o próximo item na fila de exportação"""
-        if len(self.export_queue) == 0:
-            self.is_exporting = False
+        """
+        Inicia os próximos itens da fila enquanto houver vaga e memória. Os itens começam
+        na ordem da fila: um item que não cabe na memória espera, e os seguintes também,
+        para que nenhum seja ultrapassado indefinidamente por itens menores.
+        """
+        if not self.export_queue:
             self.video_player.btn_cancel_all.config(state=tk.DISABLED)
             return
 
-        self.is_exporting = True
-        self.current_export = self.export_queue[0]
-        self.current_export["status_label"].config(text="Processando...")
-
-        self.export_thread = threading.Thread(target=self.export_video_with_effect, daemon=True)
-        self.export_thread.start()
-
-    def export_video_with_effect(self):
+        pending = [item for item in self.export_queue if item not in self.active_exports]
+        while pending and len(self.active_exports) < self.max_jobs:
+            export_item = pending[0]
+            # Os núcleos livres são divididos entre os itens que podem começar agora
+            starting = min(self.max_jobs - len(self.active_exports), len(pending))
+            free_workers = self.workers - sum(item["processes"] for item in self.active_exports)
+            processes = max(1, free_workers // starting)
+            memory = self.estimate_job_memory(export_item, processes)
+            in_use = sum(item["memory_bytes"] for item in self.active_exports)
+            # O primeiro item sempre começa, mesmo que sozinho passe do orçamento
+            if self.active_exports and in_use + memory > self.memory_budget_bytes:
+                break
+
+            pending.pop(0)
+            export_item["processes"] = processes
+            export_item["memory_bytes"] = memory
+            export_item["status_label"].config(text="Processando...")
+            self.active_exports.append(export_item)
+
+            export_item["thread"] = threading.Thread(target=self.export_video_with_effect,
+                                                     args=(export_item,), daemon=True)
+            export_item["thread"].start()
+
+    def join_exports(self, timeout=1.0):
+        """Aguarda as threads das exportações em andamento (usado ao fechar a aplicação)"""
+        for export_item in self.active_exports[:]:
+            if export_item["thread"] is not None and export_item["thread"].is_alive():
+                export_item["thread"].join(timeout=timeout)
+
+    def export_video_with_effect(self, export_item):
         """Processa o vídeo com efeito em uma thread separada"""
-        export_item = self.current_export
-
         try:
             input_path = export_item["input_path"]
             output_path = export_item["output_path"]
@@ -122,75 +187,112 @@ class VideoExporter:
 
             cap = cv2.VideoCapture(input_path)
             if not cap.isOpened():
-                self.update_export_status(export_item, "Erro: Não foi possível abrir o vídeo", True)
+                self.root.after(0, lambda: self.update_export_status(
+                    export_item, "Erro: Não foi possível abrir o vídeo", True))
                 return
 
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = cap.get(cv2.CAP_PROP_FPS)
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(temp_output_path, fourcc, fps, (width, height), True)
-
-            frame_count = 0
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                if export_item["cancelled"]:
-                    cap.release()
-                    out.release()
-                    if os.path.exists(temp_output_path):
-                        os.remove(temp_output_path)
-                    self.update_export_status(export_item, "Cancelado", True)
-                    return
-
-                processed_frame = self.video_player.effects_processor.apply_effect_to_frame(frame, effect)
-                if len(processed_frame.shape) == 2:
-                    processed_frame = cv2.cvtColor(processed_frame, cv2.COLOR_GRAY2BGR)
-
-                out.write(processed_frame)
-                frame_count += 1
-                progress = int((frame_count / total_frames) * 75)
-                self.root.after(0, lambda p=progress: self.update_export_progress(export_item, p))
-
-                if frame_count % 30 == 0:
-                    time.sleep(0.001)
-
-            cap.release()
-            out.release()
+            # Com o FFmpeg, o vídeo é codificado e mesclado ao áudio original em uma única
+            # passada, direto no arquivo final; sem ele, grava um temporário e mescla depois
+            single_pass = ffmpeg_available()
+            # A barra chega a 100% só depois que o arquivo é finalizado (ou após a mescla do áudio)
+            progress_scale = 99 if single_pass else 75
+            progress = ProgressChannel(
+                total_frames, cap.get(cv2.CAP_PROP_FPS),
+                lambda snapshot: self.root.after(
+                    0, lambda: self.show_export_progress(export_item, snapshot, progress_scale)))
+            processes = export_item["processes"]
+            segmented = SegmentedExport(input_path, effect, processes, self.batch_frames)
+            if single_pass and segmented.can_split(total_frames):
+                cap.release()
+                finished = segmented.run(
+                    output_path, total_frames, lambda: export_item["cancelled"], progress.update,
+                    audio_source=input_path)
+                print(f"Exportação em {processes} processos: {stage_report(segmented.stats)}")
+            else:
+                finished = self.export_frames(cap, export_item, progress.update, single_pass)
+            print(f"Exportação de {os.path.basename(input_path)}: {format_progress(progress.finish())}")
+
+            if not finished:
+                for path in (temp_output_path, output_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self.root.after(0, lambda: self.update_export_status(export_item, "Cancelado", True))
+                return
 
-            self.root.after(0, lambda: self.update_export_status(export_item, "Mesclando áudio..."))
+            if single_pass:
+                self.root.after(0, lambda: self.update_export_progress(export_item, 100))
+            else:
+                self.root.after(0, lambda: self.update_export_status(export_item, "Mesclando áudio..."))
 
-            self.combine_video_with_original_audio(input_path, temp_output_path, output_path, export_item)
+                self.combine_video_with_original_audio(input_path, temp_output_path, output_path, export_item)
 
-            if os.path.exists(temp_output_path):
-                os.remove(temp_output_path)
+                if os.path.exists(temp_output_path):
+                    os.remove(temp_output_path)
 
-            self.update_export_status(export_item, "Concluído", True)
+            self.root.after(0, lambda: self.update_export_status(export_item, "Concluído", True))
 
         except Exception as e:
             error_msg = f"Erro: {str(e)}"
-            self.update_export_status(export_item, error_msg, True)
+            self.root.after(0, lambda: self.update_export_status(export_item, error_msg, True))
             if os.path.exists(temp_output_path):
                 os.remove(temp_output_path)
             if os.path.exists(output_path):
                 os.remove(output_path)
 
+    def export_frames(self, cap, export_item, on_progress, single_pass=False):
+        """
+        Decodifica, processa e codifica o vídeo em estágios sobrepostos; retorna False se cancelado.
+        on_progress(frames gravados) é chamado após cada lote.
+        Com single_pass, os frames vão por pipe ao FFmpeg, que grava o arquivo final já com o
+        áudio original; sem ele, o cv2.VideoWriter grava o vídeo temporário sem áudio.
+        """
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if single_pass:
+            out = FFmpegPipeWriter(export_item["output_path"], (width, height), fps,
+                                   audio_source=export_item["input_path"])
+        else:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            out = cv2.VideoWriter(export_item["temp_output_path"], fourcc, fps, (width, height), True)
+
+        finished = False
+        try:
+            pipeline = ExportPipeline(cap, out, self.video_player.effects_processor, export_item["effect"],
+                                      self.batch_frames)
+            finished = pipeline.run(lambda: export_item["cancelled"], on_progress)
+            print(f"Exportação em estágios: {pipeline.report()}")
+            return finished
+        finally:
+            cap.release()
+            # Cancelada ou com erro, a exportação por pipe é interrompida sem finalizar o arquivo
+            if single_pass and not finished:
+                out.abort()
+            else:
+                out.release()
+
     def update_export_progress(self, export_item, progress):
         """Atualiza o progresso da exportação na interface"""
         if export_item["progress_bar"]:
             export_item["progress_bar"]["value"] = progress
 
+    def show_export_progress(self, export_item, progress, scale):
+        """Mostra na interface o progresso da etapa de frames (fps, tempo real e tempo restante)"""
+        self.update_export_progress(export_item, int(progress["fraction"] * scale))
+        if export_item["status_label"] and not export_item["cancelled"]:
+            export_item["status_label"].config(text=f"Processando... {format_progress(progress)}")
+
     def update_export_status(self, export_item, status, finished=False):
-        """Atualiza o status da exportação na interface"""
+        """Atualiza o status da exportação na interface (sempre na thread da interface)"""
         if export_item["status_label"]:
             export_item["status_label"].config(text=status)
 
         if finished:
             if export_item in self.export_queue:
                 self.export_queue.remove(export_item)
+            if export_item in self.active_exports:
+                self.active_exports.remove(export_item)
 
             if status == "Cancelado":
                 self.root.after(2000, lambda: self.remove_export_item(export_item))
@@ -200,7 +302,6 @@ class VideoExporter:
             else:
                 export_item["status_label"].config(fg="#FF0000")
 
-            self.current_export = None
             self.process_next_export()
 
     def remove_export_item(self, export_item):
@@ -210,25 +311,27 @@ class VideoExporter:
 
     def cancel_export(self, export_item):
         """Cancela a exportação de um item específico"""
-        if export_item == self.current_export:
+        if export_item in self.active_exports:
             export_item["cancelled"] = True
             export_item["status_label"].config(text="Cancelando...")
         else:
             if export_item in self.export_queue:
                 self.export_queue.remove(export_item)
-                self.remove_export_item(export_item)
+            self.remove_export_item(export_item)
+            # O item cancelado podia estar segurando a fila (ex.: por falta de memória)
+            self.process_next_export()
 
         if len(self.export_queue) == 0:
             self.video_player.btn_cancel_all.config(state=tk.DISABLED)
 
     def cancel_all_exports(self):
         """Cancela todas as exportações pendentes"""
-        if self.current_export:
-            self.current_export["cancelled"] = True
-            self.current_export["status_label"].config(text="Cancelando...")
+        for item in self.active_exports:
+            item["cancelled"] = True
+            item["status_label"].config(text="Cancelando...")
 
         for item in self.export_queue[:]:
-            if item != self.current_export:
+            if item not in self.active_exports:
                 self.export_queue.remove(item)
                 self.remove_export_item(item)
 
@@ -0,0 +1,193 @@
+import os
+import bisect
+import hashlib
+import tempfile
+import subprocess
+import threading
+import numpy as np
+
+# Pasta onde os índices (e demais dados derivados dos vídeos) ficam guardados
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+# Tamanho máximo da pasta de cache; os arquivos usados há mais tempo são apagados primeiro
+CACHE_BUDGET_MB = 2048
+
+
+def cache_path_for(file_path, suffix):
+    """Retorna o caminho de cache de um vídeo, chaveado por caminho, tamanho e data de modificação"""
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{digest}{suffix}")
+
+
+def save_cache(path, **arrays):
+    """
+    Grava arrays em um .npz do cache de forma atômica: escreve em um arquivo temporário
+    único e o renomeia, para que leitores (ou gravações simultâneas do mesmo vídeo)
+    nunca vejam um arquivo parcial. Depois limpa o cache, se ele passou do orçamento.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(suffix=".part", dir=CACHE_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    trim_cache()
+
+
+def load_cache(path, *keys):
+    """Lê os arrays de um .npz do cache; se faltar ou estiver corrompido, retorna None para ser refeito"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in keys}
+        touch_cache(path)
+        return arrays
+    except Exception as e:
+        print(f"Cache inválido, será refeito: {os.path.basename(path)} ({e})")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+
+def touch_cache(path):
+    """Marca um arquivo do cache como usado agora (a data de modificação ordena a limpeza)"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def trim_cache(budget_bytes=CACHE_BUDGET_MB * 1024 * 1024):
+    """Apaga os arquivos do cache usados há mais tempo até a pasta caber no orçamento"""
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".part"):
+            continue  # Ainda sendo gravado
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= budget_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue  # Ex.: proxy ainda mapeado em memória (no Windows não pode ser apagado)
+        total -= size
+
+
+class VideoIndex:
+    def __init__(self, file_path):
+        """
+        Índice de keyframes e timestamps (pts) de cada frame de um vídeo.
+        É calculado uma única vez com uma passada do FFprobe pelos pacotes do
+        arquivo e guardado em disco para as próximas aberturas.
+        """
+        self.file_path = file_path
+        self.keyframes = []  # Índices (em ordem de exibição) dos frames-chave
+        self.frame_times = []  # pts de cada frame em milissegundos
+        self.end_time = 0
+        self.ready = False
+        self.build_thread = None
+
+    def load_async(self):
+        """Carrega o índice do cache ou o constrói em uma thread separada"""
+        self.build_thread = threading.Thread(target=self.load_or_build, daemon=True)
+        self.build_thread.start()
+
+    def load_or_build(self):
+        """Carrega o índice do disco, construindo-o se ainda não existir"""
+        try:
+            index_path = cache_path_for(self.file_path, ".index.npz")
+            data = load_cache(index_path, "keyframes", "frame_times")
+            if data is not None:
+                self.set_index(data["keyframes"].tolist(), data["frame_times"].tolist())
+                return
+
+            if self.build():
+                save_cache(index_path,
+                           keyframes=np.array(self.keyframes, dtype=np.int64),
+                           frame_times=np.array(self.frame_times, dtype=np.float64))
+        except Exception as e:
+            print(f"Erro ao carregar índice do vídeo: {e}")
+
+    def build(self):
+        """Percorre os pacotes de vídeo com o FFprobe, sem decodificar, para montar o índice"""
+        cmd = [
+            "ffprobe",
+            "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            self.file_path
+        ]
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                       universal_newlines=True)
+        except OSError:
+            print("FFprobe não encontrado: busca usará o posicionamento padrão do OpenCV.")
+            return False
+
+        # Lê a saída em streaming para não manter o texto inteiro em memória
+        packet_times = []
+        keyframe_times = []
+        for line in process.stdout:
+            fields = line.strip().split(",")
+            if len(fields) < 2 or fields[0] in ("", "N/A"):
+                continue
+            pts_ms = float(fields[0]) * 1000
+            packet_times.append(pts_ms)
+            if "K" in fields[1]:
+                keyframe_times.append(pts_ms)
+        process.wait()
+
+        if process.returncode != 0 or not packet_times:
+            return False
+
+        # Os pacotes vêm em ordem de decodificação; os frames são exibidos em ordem de pts
+        frame_times = sorted(packet_times)
+        keyframes = [bisect.bisect_left(frame_times, t) for t in sorted(keyframe_times)]
+        self.set_index(keyframes, frame_times)
+        return True
+
+    def set_index(self, keyframes, frame_times):
+        """Publica o índice para as demais threads"""
+        # Normaliza os tempos para que o primeiro frame comece em zero
+        first_time = frame_times[0] if frame_times else 0
+        self.frame_times = [t - first_time for t in frame_times]
+        self.keyframes = keyframes
+
+        # Fim do último frame, estimado pela duração do penúltimo intervalo
+        if len(self.frame_times) > 1:
+            self.end_time = 2 * self.frame_times[-1] - self.frame_times[-2]
+        else:
+            self.end_time = self.frame_times[-1] if self.frame_times else 0
+        self.ready = True
+
+    def frame_for_time(self, ms):
+        """Retorna o índice do frame exibido no tempo especificado"""
+        if ms >= self.end_time:
+            return len(self.frame_times)
+        return max(0, bisect.bisect_right(self.frame_times, ms) - 1)
+
+    def keyframe_before(self, frame_index):
+        """Retorna o frame-chave mais próximo a partir do qual o frame pode ser decodificado"""
+        position = bisect.bisect_right(self.keyframes, frame_index) - 1
+        return self.keyframes[position] if position >= 0 else 0
+
+    def keyframe_position(self, frame_index):
+        """Retorna a posição, na lista de keyframes, do keyframe a partir do qual o frame é decodificado"""
+        return max(0, bisect.bisect_right(self.keyframes, frame_index) - 1)
@@ -9,25 +9,35 @@ import os
 import threading
 import shutil
 from effects_processor import EffectsProcessor
+from effect_registry import EFFECTS, get_effect
 from video_engine import VideoEngine
 from video_exporter import VideoExporter
+from thumbnail_sheet import ThumbnailSheet
+from scrub_proxy import ScrubProxy
 
 class VideoPlayer:
-    def __init__(self, root):
+    def __init__(self, root, buffer_budget_mb=256, effect_tiles=0, effect_cache_mb=256, export_workers=0,
+                 export_jobs=0, export_memory_mb=0):
         self.root = root
         self.root.title("Player de Vídeo Avançado")
         self.root.configure(bg="#2C2C2C")
 
         # Instanciar o processador de efeitos e o motor de vídeo
-        self.effects_processor = EffectsProcessor()
+        self.effects_processor = EffectsProcessor(tiles=effect_tiles, cache_budget_mb=effect_cache_mb)
         self.ffmpeg_available = self.check_ffmpeg_availability()
-        self.video_engine = VideoEngine(self.effects_processor)
+        # O engine já entrega os frames em RGB, prontos para o Tk
+        self.video_engine = VideoEngine(self.effects_processor, buffer_budget_mb, output_format="rgb")
 
         # Variáveis de controle
         self.mode = "vlc"  # "vlc" para modo normal ou "opencv" para modo com efeito
         self.current_file = None
         self.last_position = 0
         self.position_set = False
+        self.displayed_frame = None  # Índice do último frame exibido no modo OpenCV
+        self.thumbnail_sheet = None  # Miniaturas para a pré-visualização do slider
+        self.preview_window = None
+        self.scrub_proxy = None  # Proxy de baixa resolução exibido ao arrastar o slider
+        self.scrubbing = False
 
         # Instância do VLC e players para áudio/vídeo
         self.instance = vlc.Instance()
@@ -38,7 +48,8 @@ class VideoPlayer:
         self.setup_ui()
 
         # Instanciar o exportador e vincular os botões de exportação
-        self.exporter = VideoExporter(self)
+        self.exporter = VideoExporter(self, workers=export_workers, max_jobs=export_jobs,
+                                      memory_budget_mb=export_memory_mb)
         self.btn_generate.config(command=lambda: self.exporter.queue_video_export())
         self.btn_cancel_all.config(command=lambda: self.exporter.cancel_all_exports())
 
@@ -75,6 +86,18 @@ class VideoPlayer:
                                           bg="#2C2C2C", fg="white", font=("Arial", 10))
         self.current_fps_label.pack(pady=5, anchor="w")
 
+        self.dropped_frames_label = tk.Label(self.info_frame, text="Frames Descartados: 0",
+                                             bg="#2C2C2C", fg="white", font=("Arial", 10))
+        self.dropped_frames_label.pack(pady=5, anchor="w")
+
+        self.buffer_memory_label = tk.Label(self.info_frame, text="Memória do Buffer: --",
+                                            bg="#2C2C2C", fg="white", font=("Arial", 10))
+        self.buffer_memory_label.pack(pady=5, anchor="w")
+
+        self.effect_cache_label = tk.Label(self.info_frame, text="Cache de Efeitos: --",
+                                           bg="#2C2C2C", fg="white", font=("Arial", 10))
+        self.effect_cache_label.pack(pady=5, anchor="w")
+
         # Controles de reprodução
         control_frame = tk.Frame(self.root, bg="#2C2C2C")
         control_frame.pack(pady=5)
@@ -114,12 +137,18 @@ class VideoPlayer:
                                bg="#2C2C2C", fg="white", troughcolor="#4A4A4A",
                                highlightthickness=0, width=8)
         self.slider.pack(pady=5)
+        self.slider.bind("<ButtonPress-1>", self.slider_pressed)
         self.slider.bind("<ButtonRelease-1>", self.slider_released)
+        self.slider.bind("<Motion>", self.slider_hover)
+        self.slider.bind("<Leave>", self.hide_slider_preview)
         self.time_label = tk.Label(self.root, text="00:00 / 00:00", bg="#2C2C2C", fg="white")
         self.time_label.pack()
 
         # Seletor de efeitos
         self.effect_var = tk.StringVar(value="none")
+        self.current_effect = "none"  # Último efeito aplicado, já com os parâmetros dos controles
+        self.effect_params = {}  # (efeito, parâmetro) -> variável do controle deslizante
+        self.chain_var = tk.StringVar(value="")
         self.updating_slider = False
 
         # Botão para gerar vídeo (ação definida pela classe VideoExporter)
@@ -158,6 +187,15 @@ class VideoPlayer:
             self.effects_processor.clear_cache()
             self.current_file = file_path
 
+            # Gera (ou carrega do cache) as miniaturas do slider em segundo plano
+            if self.thumbnail_sheet is not None:
+                self.thumbnail_sheet.cancel()
+            self.thumbnail_sheet = ThumbnailSheet(file_path)
+            self.thumbnail_sheet.generate_async()
+            if self.scrub_proxy is not None:
+                self.scrub_proxy.cancel()
+                self.scrub_proxy = None
+
             temp_cap = cv2.VideoCapture(file_path)
             if temp_cap.isOpened():
                 fps = temp_cap.get(cv2.CAP_PROP_FPS)
@@ -166,9 +204,10 @@ class VideoPlayer:
                     self.original_fps_label.config(text=f"FPS Original: {fps:.2f}")
                 temp_cap.release()
 
-            if self.effect_var.get() != "none":
+            if self.current_effect != "none":
                 self.mode = "opencv"
                 self.video_engine.load_video_stream(file_path, self.video_frame.winfo_width(), self.video_frame.winfo_height())
+                self.start_scrub_proxy()
                 total_time = int((self.video_engine.total_frames / self.video_engine.fps) * 1000)
                 self.slider.config(to=total_time)
                 self.time_label.config(text=f"00:00 / {self.format_time(total_time)}")
@@ -187,6 +226,15 @@ class VideoPlayer:
                 self.current_fps_label.config(text="FPS Atual: 0.00")
                 self.root.after(100, self.set_video_length)
 
+    def start_scrub_proxy(self):
+        """Gera (ou carrega do cache) o proxy do slider; só o modo OpenCV o exibe"""
+        if self.scrub_proxy is not None and self.scrub_proxy.file_path == self.current_file:
+            return
+        if self.scrub_proxy is not None:
+            self.scrub_proxy.cancel()
+        self.scrub_proxy = ScrubProxy(self.current_file)
+        self.scrub_proxy.generate_async()
+
     def start_opencv_playback(self):
         """Inicia a reprodução utilizando OpenCV"""
         self.video_engine.start_playback()
@@ -204,21 +252,28 @@ class VideoPlayer:
         if self.mode != "opencv" or not self.video_engine.playing:
             return
 
+        if self.scrubbing:
+            # O proxy ocupa a área de vídeo enquanto o slider é arrastado
+            self.root.after(20, self.show_next_frame)
+            return
+
         frame = self.video_engine.get_next_frame()
         if frame is not None:
-            if len(frame.shape) == 2:
-                img = Image.fromarray(frame).convert('RGB')
-            else:
-                img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            desired_frame = self.video_engine.current_frame
 
-            photo = ImageTk.PhotoImage(image=img)
-            self.video_label.config(image=photo)
-            self.video_label.image = photo
+            # Só redesenha quando a thread de decodificação entregou um frame novo
+            frame_is_new = desired_frame != self.displayed_frame
+            if frame_is_new:
+                img = Image.fromarray(frame)
+
+                photo = ImageTk.PhotoImage(image=img)
+                self.video_label.config(image=photo)
+                self.video_label.image = photo
+                self.displayed_frame = desired_frame
 
             self.update_fps_display()
 
             elapsed_ms = self.video_engine.get_elapsed_time()
-            desired_frame = self.video_engine.current_frame
 
             if desired_frame % 4 == 0:
                 total_time = int((self.video_engine.total_frames / self.video_engine.fps) * 1000)
@@ -228,9 +283,15 @@ class VideoPlayer:
             frame_interval = 1000 / self.video_engine.fps
             next_frame_time = (desired_frame + 1) * frame_interval
             time_to_wait = max(1, min(int(frame_interval), int(next_frame_time - elapsed_ms)))
+            if not frame_is_new:
+                # Aguarda um pouco mais enquanto o frame desejado ainda não está pronto
+                time_to_wait = max(time_to_wait, 5)
             self.root.after(time_to_wait, self.show_next_frame)
-        else:
+        elif self.video_engine.reached_end():
             self.stop_video()
+        else:
+            # Primeiro frame ainda em decodificação
+            self.root.after(10, self.show_next_frame)
 
     def update_fps_display(self):
         """Atualiza o FPS atual exibido"""
@@ -239,6 +300,14 @@ class VideoPlayer:
             self.current_fps_label.config(text=f"FPS Atual: {fps:.2f}")
         else:
             self.current_fps_label.config(text="FPS Atual: 0.00")
+        self.dropped_frames_label.config(text=f"Frames Descartados: {self.video_engine.dropped_frames}")
+        used, allocated = self.video_engine.buffer_memory()
+        self.buffer_memory_label.config(
+            text=f"Memória do Buffer: {used / 2**20:.0f}/{allocated / 2**20:.0f} MB")
+        used, budget = self.effects_processor.cache_memory()
+        self.effect_cache_label.config(
+            text=f"Cache de Efeitos: {used / 2**20:.0f}/{budget / 2**20:.0f} MB, "
+                 f"{self.effects_processor.cache_stats['evictions']} descartes")
 
     def set_video_length(self):
         """Configura o comprimento do vídeo no modo VLC"""
@@ -313,6 +382,7 @@ class VideoPlayer:
         elif self.mode == "opencv":
             self.video_engine.stop()
             self.audio_player.stop()
+            self.displayed_frame = None
             self.slider.set(0)
             self.time_label.config(text="00:00 / 00:00")
             self.current_fps_label.config(text="FPS Atual: 0.00")
@@ -342,30 +412,89 @@ class VideoPlayer:
             self.time_label.config(text=f"{self.format_time(current_time)} / {self.format_time(total_time)}")
         self.root.after(500, self.update_slider)
 
+    def slider_pressed(self, event):
+        """Callback ao clicar no slider: inicia a navegação pelo proxy"""
+        self.scrubbing = True
+
     def slider_moved(self, val):
         """Callback ao mover o slider"""
         self.updating_slider = True
+        if self.scrubbing:
+            self.show_scrub_frame(float(val))
+
+    def show_scrub_frame(self, ms):
+        """Exibe o frame do proxy mais próximo enquanto o slider é arrastado"""
+        if self.mode != "opencv" or self.video_label is None or self.scrub_proxy is None:
+            return
+        frame = self.scrub_proxy.frame_at(ms)
+        if frame is None:
+            return
+
+        # O proxy é pequeno: aplica o efeito atual e amplia para a área de vídeo.
+        # Enquanto o efeito é pré-calculado em segundo plano, mostra o frame sem efeito
+        effect = self.video_engine.current_effect
+        if not self.effects_processor.chain_ready(effect, output_format="rgb"):
+            effect = "none"
+        frame = self.effects_processor.apply_effect_to_frame(frame, effect, output_format="rgb")
+        frame = cv2.resize(frame, self.video_engine.frame_size, interpolation=cv2.INTER_LINEAR)
+        img = Image.fromarray(frame)
+        photo = ImageTk.PhotoImage(image=img)
+        self.video_label.config(image=photo)
+        self.video_label.image = photo
+        self.time_label.config(text=f"{self.format_time(int(ms))} / {self.format_time(int(float(self.slider.cget('to'))))}")
 
     def slider_released(self, event):
         """Callback ao soltar o slider"""
+        self.scrubbing = False
         new_time = self.scale_var.get()
         if self.mode == "vlc":
             self.player.set_time(new_time)
         elif self.mode == "opencv":
             self.audio_player.set_time(new_time)
             self.video_engine.seek_to_time(new_time)
+            self.displayed_frame = None
             if not self.video_engine.playing and self.video_label is not None:
                 frame = self.video_engine.get_current_frame()
                 if frame is not None:
-                    if len(frame.shape) == 2:
-                        img = Image.fromarray(frame).convert('RGB')
-                    else:
-                        img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                    img = Image.fromarray(frame)
                     photo = ImageTk.PhotoImage(image=img)
                     self.video_label.config(image=photo)
                     self.video_label.image = photo
         self.updating_slider = False
 
+    def slider_hover(self, event):
+        """Mostra a miniatura do instante sob o cursor no slider"""
+        if self.thumbnail_sheet is None:
+            return
+
+        # Converte a posição do cursor no valor (ms) correspondente do slider
+        ms = float(self.slider.tk.call(str(self.slider), "get", event.x, event.y))
+        thumbnail = self.thumbnail_sheet.thumbnail_at(ms)
+        if thumbnail is None:
+            return
+
+        if self.preview_window is None:
+            self.preview_window = tk.Toplevel(self.root)
+            self.preview_window.overrideredirect(True)
+            self.preview_label = tk.Label(self.preview_window, bg="#2C2C2C", fg="white",
+                                          compound=tk.TOP, font=("Arial", 8))
+            self.preview_label.pack()
+
+        photo = ImageTk.PhotoImage(image=Image.fromarray(cv2.cvtColor(thumbnail, cv2.COLOR_BGR2RGB)))
+        self.preview_label.config(image=photo, text=self.format_time(int(ms)))
+        self.preview_label.image = photo
+
+        # Posiciona a miniatura acima do cursor
+        x = event.x_root - thumbnail.shape[1] // 2
+        y = self.slider.winfo_rooty() - thumbnail.shape[0] - 24
+        self.preview_window.geometry(f"+{x}+{y}")
+        self.preview_window.deiconify()
+
+    def hide_slider_preview(self, event=None):
+        """Esconde a miniatura do slider"""
+        if self.preview_window is not None:
+            self.preview_window.withdraw()
+
     def open_effects_window(self):
         """Abre a janela de seleção de efeitos ou traz a existente para frente."""
         # Verifica se a janela já foi criada e se ainda existe
@@ -392,39 +521,82 @@ class VideoPlayer:
                                 bg="#2C2C2C", fg="white", selectcolor="#4A4A4A")
         rb_none.pack(anchor='w', padx=10, pady=5)
 
-        rb_bw = tk.Radiobutton(self.effects_window, text="Preto e Branco",
-                            variable=self.effect_var, value="bw",
-                            bg="#2C2C2C", fg="white", selectcolor="#4A4A4A")
-        rb_bw.pack(anchor='w', padx=10, pady=5)
-
-        rb_negative = tk.Radiobutton(self.effects_window, text="Negativo",
-                                    variable=self.effect_var, value="negative",
-                                    bg="#2C2C2C", fg="white", selectcolor="#4A4A4A")
-        rb_negative.pack(anchor='w', padx=10, pady=5)
-
-        rb_sepia = tk.Radiobutton(self.effects_window, text="Sépia",
-                                variable=self.effect_var, value="sepia",
-                                bg="#2C2C2C", fg="white", selectcolor="#4A4A4A")
-        rb_sepia.pack(anchor='w', padx=10, pady=5)
-
-        rb_posterize = tk.Radiobutton(self.effects_window, text="Posterização",
-                                    variable=self.effect_var, value="posterize",
-                                    bg="#2C2C2C", fg="white", selectcolor="#4A4A4A")
-        rb_posterize.pack(anchor='w', padx=10, pady=5)
-
-        rb_vignette = tk.Radiobutton(self.effects_window, text="Vinheta",
-                                    variable=self.effect_var, value="vignette",
-                                    bg="#2C2C2C", fg="white", selectcolor="#4A4A4A")
-        rb_vignette.pack(anchor='w', padx=10, pady=5)
+        # Um Radiobutton por efeito do registro
+        for definition in EFFECTS.values():
+            if not definition.in_menu:
+                continue
+            rb_effect = tk.Radiobutton(self.effects_window, text=definition.label,
+                                       variable=self.effect_var, value=definition.name,
+                                       bg="#2C2C2C", fg="white", selectcolor="#4A4A4A")
+            rb_effect.pack(anchor='w', padx=10, pady=5)
+
+            # Controles dos parâmetros ajustáveis declarados pelo efeito
+            for key, (label, minimum, maximum) in definition.controls.items():
+                variable = self.effect_params.setdefault(
+                    (definition.name, key), tk.DoubleVar(value=definition.params[key]))
+                is_int = isinstance(definition.params[key], int)
+                scale = tk.Scale(self.effects_window, label=label, variable=variable,
+                                 from_=minimum, to=maximum, resolution=1 if is_int else 0.05,
+                                 orient=tk.HORIZONTAL, length=180, bg="#2C2C2C", fg="white",
+                                 highlightthickness=0)
+                scale.pack(anchor='w', padx=30)
 
         btn_apply = tk.Button(self.effects_window, text="Aplicar",
-                            command=lambda: self.apply_effect(self.effect_var.get()),
+                            command=self.apply_selected_effect,
                             bg="#4A4A4A", fg="white", relief=tk.FLAT)
         btn_apply.pack(padx=10, pady=10)
 
+        # Cadeia de efeitos combinados, aplicados em sequência
+        chain_label = tk.Label(self.effects_window, text="Cadeia (ex.: posterize+negative+sepia):",
+                               bg="#2C2C2C", fg="white")
+        chain_label.pack(anchor='w', padx=10)
+
+        chain_entry = tk.Entry(self.effects_window, textvariable=self.chain_var, width=32)
+        chain_entry.pack(anchor='w', padx=10, pady=5)
+
+        btn_apply_chain = tk.Button(self.effects_window, text="Aplicar Cadeia",
+                                    command=self.apply_effect_chain,
+                                    bg="#4A4A4A", fg="white", relief=tk.FLAT)
+        btn_apply_chain.pack(padx=10, pady=10)
+
+        btn_cube = tk.Button(self.effects_window, text="Carregar LUT (.cube)...",
+                             command=self.apply_cube_lut,
+                             bg="#4A4A4A", fg="white", relief=tk.FLAT)
+        btn_cube.pack(padx=10, pady=(0, 10))
+
+    def apply_selected_effect(self):
+        """Aplica o efeito marcado na janela de efeitos com os parâmetros dos controles"""
+        effect = self.effect_var.get()
+        definition = get_effect(effect)
+        if definition is not None:
+            params = {key: self.effect_params[(effect, key)].get()
+                      for key in definition.controls if (effect, key) in self.effect_params}
+            effect = definition.format_params(params)
+        self.apply_effect(effect)
+
+    def apply_cube_lut(self):
+        """Escolhe um arquivo .cube e aplica a LUT 3D como efeito"""
+        file_path = filedialog.askopenfilename(parent=self.effects_window,
+                                               filetypes=[("LUT 3D", "*.cube"), ("Todos os arquivos", "*.*")])
+        if file_path:
+            effect = f'lut:path="{file_path}"'
+            self.chain_var.set(effect)
+            self.effect_var.set(effect)
+            self.apply_effect(effect)
+
+    def apply_effect_chain(self):
+        """Aplica a cadeia de efeitos digitada na janela de efeitos"""
+        chain = self.chain_var.get().strip()
+        if not chain or not self.effects_processor.is_valid_chain(chain):
+            print(f"Cadeia de efeitos inválida: {chain}")
+            return
+        self.effect_var.set(chain)
+        self.apply_effect(chain)
+
 
     def apply_effect(self, effect):
         """Aplica o efeito selecionado ao vídeo"""
+        self.current_effect = effect
         if self.current_file:
             self.video_engine.set_effect(effect)
 
@@ -447,6 +619,7 @@ class VideoPlayer:
                 self.player.stop()
                 self.mode = "opencv"
                 self.video_engine.load_video_stream(self.current_file, self.video_frame.winfo_width(), self.video_frame.winfo_height())
+                self.start_scrub_proxy()
 
                 if self.video_engine.fps > 0:
                     self.original_fps_label.config(text=f"FPS Original: {self.video_engine.fps:.2f}")
@@ -497,28 +670,44 @@ class VideoPlayer:
 
                 self.root.after(200, set_vlc_position)
             elif effect != "none" and self.mode == "opencv":
-                self.video_engine.reload_frame_buffer()
-                if not self.video_engine.playing and self.video_label is not None:
-                    frame = self.video_engine.get_current_frame()
-                    if frame is not None:
-                        if len(frame.shape) == 2:
-                            img = Image.fromarray(frame).convert('RGB')
-                        else:
-                            img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-                        photo = ImageTk.PhotoImage(image=img)
-                        self.video_label.config(image=photo)
-                        self.video_label.image = photo
+                # Os frames decodificados são mantidos; só o efeito é recalculado
+                self.redraw_paused_frame(effect)
+
+    def redraw_paused_frame(self, effect):
+        """
+        Redesenha o frame pausado com o efeito. Se o efeito ainda estiver sendo
+        pré-calculado em segundo plano (ex.: LUT 3D), tenta de novo em seguida em vez
+        de bloquear a interface.
+        """
+        if self.video_engine.playing or self.video_label is None or effect != self.video_engine.current_effect:
+            return
+        if not self.effects_processor.chain_ready(effect, output_format="rgb"):
+            self.root.after(100, lambda: self.redraw_paused_frame(effect))
+            return
+        frame = self.video_engine.get_current_frame()
+        if frame is not None:
+            img = Image.fromarray(frame)
+            photo = ImageTk.PhotoImage(image=img)
+            self.video_label.config(image=photo)
+            self.video_label.image = photo
 
     def on_close(self):
         """Método chamado ao fechar a aplicação"""
         if hasattr(self, "exporter"):
             self.exporter.cancel_all_exports()
 
-        if hasattr(self, "exporter") and self.exporter.export_thread and self.exporter.export_thread.is_alive():
-            self.exporter.export_thread.join(timeout=1.0)
+        if self.thumbnail_sheet is not None:
+            self.thumbnail_sheet.cancel()
+        if self.scrub_proxy is not None:
+            self.scrub_proxy.cancel()
+
+        if hasattr(self, "exporter"):
+            self.exporter.join_exports(timeout=1.0)
 
         if self.mode == "opencv":
             self.video_engine.stop()
+        self.video_engine.release()
+        self.effects_processor.shutdown()
 
         self.player.stop()
         self.audio_player.stop()